@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Compare the JSON backends supported by `enhance_json_encode()`,
+and the binary formats supported by `enhance_binary_encode()` (payload size, encode and decode time).
+
+Usage:
+    python benchmarks/json_backends.py [row_count]
+"""
+import sys
+import os
+import timeit
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from json_encode_manager import JSONEncodeManager
+from flask_restful_extend.extend_json import json_backends
+from flask_restful_extend.extend_binary import binary_formats
+import json
+
+
+def make_marshalled_rows(count):
+    """Rows likes the output of `marshal_with_model`: all values are already JSON compatible."""
+    now = 1400000000.0
+    return [dict(id=i, name=u'student_{}'.format(i), nickname=u'学生{}'.format(i), age=i % 30, score=i * 0.5,
+                 is_active=i % 2 == 0, notes=None, created_at=now + i, updated_at=now + i * 2)
+            for i in range(count)]
+
+
+def make_raw_rows(count):
+    """Rows that contain values must be handled by the `default` hook (`JSONEncodeManager`)."""
+    now = datetime(2014, 5, 13, 16, 53, 20)
+    return [dict(id=i, name=u'student_{}'.format(i), balance=Decimal(i) / 4, created_at=now)
+            for i in range(count)]
+
+
+def main(row_count=5000, repeat=5):
+    settings = dict(default=JSONEncodeManager(), ensure_ascii=False)
+    payloads = [('marshalled', make_marshalled_rows(row_count)), ('default hook', make_raw_rows(row_count))]
+
+    print('rows: {}, best of {} runs'.format(row_count, repeat))
+    for name, loader in json_backends.items():
+        try:
+            dumps = loader()
+        except ImportError:
+            print('{:<10} not installed'.format(name))
+            continue
+
+        results = []
+        for payload_name, payload in payloads:
+            cost = min(timeit.repeat(lambda: dumps(payload, settings), number=1, repeat=repeat))
+            results.append('{}: {:.2f}ms'.format(payload_name, cost * 1000))
+        print('{:<10} {}'.format(name, ', '.join(results)))
+
+    compare_formats(payloads, repeat)
+
+
+_format_loads = {
+    'json': lambda: json.loads,
+    'msgpack': lambda: __import__('msgpack').unpackb,
+    'cbor': lambda: __import__('cbor2').loads,
+}
+
+
+def compare_formats(payloads, repeat):
+    """Compare the payload size, encode and decode time of JSON (standard library) and the binary formats."""
+    encoder = JSONEncodeManager()
+    json_dumps = lambda data: json.dumps(data, default=encoder, ensure_ascii=False).encode('utf-8')
+    formats = [('json', json_dumps)]
+    for name, (_, loader) in binary_formats.items():
+        try:
+            formats.append((name, loader(encoder)[0]))
+        except ImportError:
+            print('{:<10} not installed'.format(name))
+
+    print('\nformats:')
+    for name, dumps in formats:
+        loads = _format_loads[name]()
+        results = []
+        for payload_name, payload in payloads:
+            dumped = dumps(payload)
+            encode_cost = min(timeit.repeat(lambda: dumps(payload), number=1, repeat=repeat))
+            decode_cost = min(timeit.repeat(lambda: loads(dumped), number=1, repeat=repeat))
+            results.append('{}: {}KB, encode {:.2f}ms, decode {:.2f}ms'.format(
+                payload_name, len(dumped) // 1024, encode_cost * 1000, decode_cost * 1000))
+        print('{:<10} {}'.format(name, '; '.join(results)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmarks of flask-restful-extend's hot paths, run against in-memory SQLite.
+
+Usage:
+    python benchmarks/run.py                            # run all benchmarks, print the results
+    python benchmarks/run.py -o results.json            # also save the results as JSON
+    python benchmarks/run.py -c old_results.json        # compare with the results of another version
+    python benchmarks/run.py -k marshal                 # only run benchmarks whose name contains "marshal"
+    python benchmarks/run.py --quick                    # smaller data sets, for a quick check
+
+Every result is the best time (in seconds) of one operation, among several runs.
+
+See also `json_backends.py`, that compares the JSON backends supported by `enhance_json_encode()`.
+"""
+import sys
+import os
+import json
+import timeit
+import platform
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import Flask, request
+from flask_restful import Api, Resource
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime
+import flask_restful_extend as restful_extend
+from flask_restful_extend import quick_marshal, make_request_parser, populate_model, \
+    complex_validates, bulk_validate, register_model_converter, enhance_json_encode, support_jsonp
+
+
+_benchmarks = []
+
+
+def benchmark(fn):
+    _benchmarks.append(fn)
+    return fn
+
+
+def measure(fn, number=1, repeat=5):
+    """Return the best time of one call of `fn`"""
+    return min(timeit.Timer(fn).repeat(repeat=repeat, number=number)) / number
+
+
+class Env(object):
+    """The Flask app, database and models shared by the benchmarks."""
+    def __init__(self, quick=False):
+        self.quick = quick
+        self.row_counts = [100, 1000] if quick else [100, 1000, 10000]
+        self.widths = [5, 20]
+
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        self.db = SQLAlchemy(self.app)
+        self.models = {width: self.make_model(width) for width in self.widths}
+
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.db.create_all()
+        for model in self.models.values():
+            self.fill(model, max(self.row_counts))
+
+    def make_model(self, width):
+        """Make a model that has `width` columns (include the primary key), with mixed column types."""
+        column_types = [
+            lambda: Column(String(100), nullable=False),
+            lambda: Column(Integer),
+            lambda: Column(Float),
+            lambda: Column(Boolean),
+            lambda: Column(DateTime),
+        ]
+        attrs = dict(__tablename__='model_{}'.format(width), id=Column(Integer, primary_key=True))
+        for i in range(width - 1):
+            attrs['col_{}'.format(i)] = column_types[i % len(column_types)]()
+        return type('Model{}'.format(width), (self.db.Model,), attrs)
+
+    def fill(self, model, count):
+        now = datetime(2014, 5, 13, 16, 53, 20)
+        values = [u'student 学生', 18, 95.5, True, now]
+        rows = []
+        for i in range(count):
+            row = dict(id=i + 1)
+            for j, col in enumerate(model.__table__.columns):
+                if col.name != 'id':
+                    row[col.name] = values[(j - 1) % len(values)]
+            rows.append(row)
+        self.db.session.bulk_insert_mappings(model, rows)
+        self.db.session.commit()
+
+
+@benchmark
+def bench_marshal(env):
+    results = {}
+    for width, model in env.models.items():
+        marshal = quick_marshal(model)
+        projection_marshal = quick_marshal(model, projection=True)
+        for count in env.row_counts:
+            instances = model.query.limit(count).all()
+            results['marshal.instances.w{}.n{}'.format(width, count)] = measure(lambda: marshal(instances))
+            results['marshal.projection_query.w{}.n{}'.format(width, count)] = \
+                measure(lambda: projection_marshal(model.query.limit(count)))
+    return results
+
+
+@benchmark
+def bench_datetime(env):
+    """Marshal datetime columns by the different `datetime_format`s."""
+    model = env.models[max(env.widths)]
+    count = 10000 if env.quick else 100000
+    datetime_columns = [col.name for col in model.__table__.columns if isinstance(col.type, DateTime)]
+
+    class Row(object):
+        pass
+
+    now = datetime(2014, 5, 13, 16, 53, 20)
+    rows = []
+    for i in range(count):
+        row = Row()
+        for name in datetime_columns:
+            setattr(row, name, now)
+        rows.append(row)
+
+    results = {}
+    for datetime_format in ['timestamp', 'epoch', 'epoch_ms', 'iso']:
+        marshal = quick_marshal(model, only=datetime_columns, datetime_format=datetime_format)
+        results['datetime.{}.n{}'.format(datetime_format, count)] = measure(lambda: marshal(rows), repeat=3)
+    return results
+
+
+@benchmark
+def bench_parallel(env):
+    """Marshal and dump a large result set in one process, and in a process pool."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    model = env.models[max(env.widths)]
+    count = max(env.row_counts)
+    query = model.query.limit(count)
+
+    serial = quick_marshal(model, projection=True)
+    results = {'parallel.serial.n{}'.format(count): measure(lambda: json.dumps(serial(query)), repeat=3)}
+
+    workers = os.cpu_count() or 2
+    with ProcessPoolExecutor(workers) as executor:
+        parallel = quick_marshal(model, parallel=executor, chunk_size=max(count // workers, 1))
+        parallel(query)     # start the worker processes
+        results['parallel.workers{}.n{}'.format(workers, count)] = measure(lambda: parallel(query), repeat=3)
+    return results
+
+
+@benchmark
+def bench_layout(env):
+    """Marshal and dump a list of objects in the default layout and the columnar layouts."""
+    model = env.models[max(env.widths)]
+    count = max(env.row_counts)
+    instances = model.query.limit(count).all()
+    marshal = quick_marshal(model, layout_arg='layout')
+
+    results = {}
+    for layout in ['objects', 'table', 'columns']:
+        with env.app.test_request_context('/?layout=' + layout):
+            results['layout.{}.n{}'.format(layout, count)] = \
+                measure(lambda: json.dumps(marshal(instances)), repeat=3)
+    return results
+
+
+@benchmark
+def bench_reqparse(env):
+    results = {}
+    for width, model in env.models.items():
+        results['reqparse.make_request_parser.w{}'.format(width)] = measure(lambda: make_request_parser(model), 100)
+
+        data = {col.name: 'abc' if col.name == 'col_0' else None for col in model.__table__.columns if col.name != 'id'}
+        with env.app.test_request_context(method='POST', data=json.dumps(data), content_type='application/json'):
+            results['reqparse.populate_model.w{}'.format(width)] = measure(lambda: populate_model(model), 100)
+    return results
+
+
+@benchmark
+def bench_validates(env):
+    class Validated(env.db.Model):
+        id = Column(Integer, primary_key=True)
+        name = Column(String(100))
+        age = Column(Integer)
+
+        validator = complex_validates({
+            'name': [('min_length', 1), ('max_length', 100), ('match', '^[a-z]'), 'trans_upper'],
+            'age': [('min', 0), ('max', 150)],
+        })
+
+    count = max(env.row_counts)
+    rows = [dict(name='student', age=i % 100) for i in range(count)]
+
+    def assign():
+        for row in rows:
+            Validated(**row)
+
+    return {
+        'validates.assign.n{}'.format(count): measure(assign, repeat=3),
+        'validates.bulk_validate.n{}'.format(count): measure(lambda: bulk_validate(Validated, rows), repeat=3),
+    }
+
+
+@benchmark
+def bench_json_output(env):
+    results = {}
+    count = max(env.row_counts)
+    model = env.models[max(env.widths)]
+    data = quick_marshal(model)(model.query.limit(count).all())
+
+    for backend in ['json', 'auto']:
+        app = Flask(__name__)
+        api = Api(app)
+
+        class Routes(Resource):
+            def get(self):
+                return data
+        api.add_resource(Routes, '/')
+        enhance_json_encode(api, backend=backend)
+        support_jsonp(api)
+
+        client = app.test_client()
+        results['json_output.{}.n{}'.format(backend, count)] = measure(lambda: client.get('/'))
+        results['json_output.{}.jsonp.n{}'.format(backend, count)] = measure(lambda: client.get('/?callback=cb'))
+    return results
+
+
+@benchmark
+def bench_converter(env):
+    app = env.app
+    model = env.models[min(env.widths)]
+    register_model_converter(model, app)
+    url_map = app.url_map
+
+    class Routes(Resource):
+        def get(self, inst, inst2=None):
+            return None
+
+    api = Api(app)
+    api.add_resource(Routes, '/converter/<{}:inst>'.format(model.__name__),
+                     '/converter/<{}:inst>/<{}:inst2>'.format(model.__name__, model.__name__))
+
+    converter = url_map.converters[model.__name__](url_map)
+    client = app.test_client()
+
+    def to_python():
+        request._model_converter_cache = {}     # don't hit the request scope cache
+        converter.to_python('1')
+
+    with app.test_request_context():
+        results = {'converter.to_python': measure(to_python, 100)}
+    results['converter.request'] = measure(lambda: client.get('/converter/1'), 20)
+    results['converter.request_two_instances'] = measure(lambda: client.get('/converter/1/2'), 20)
+    return results
+
+
+def run(quick=False, keyword=None):
+    env = Env(quick)
+    results = {}
+    for fn in _benchmarks:
+        if keyword and keyword not in fn.__name__:
+            continue
+        result = fn(env)
+        for name in sorted(result):
+            print('{:<50} {:>12.3f}ms'.format(name, result[name] * 1000))
+        results.update(result)
+    return results
+
+
+def compare(results, old_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    print('\ncompare with {} (version {}):'.format(old_path, old.get('version')))
+    for name in sorted(results):
+        if name in old['results']:
+            ratio = results[name] / old['results'][name]
+            print('{:<50} {:>8.2f}x {}'.format(name, ratio, '(slower)' if ratio > 1.1 else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='flask-restful-extend benchmarks')
+    parser.add_argument('-o', '--output', help='save the results to this JSON file')
+    parser.add_argument('-c', '--compare', help='compare with the results in this JSON file')
+    parser.add_argument('-k', '--keyword', help='only run the benchmarks whose name contains this keyword')
+    parser.add_argument('--quick', action='store_true', help='use smaller data sets')
+    args = parser.parse_args()
+
+    results = run(args.quick, args.keyword)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(dict(version=restful_extend.__version__, python=platform.python_version(),
+                           time=datetime.now().isoformat(), results=results), f, indent=2, sort_keys=True)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,9 +3,17 @@
 __version__ = '0.3.7'
 
 from .error_handling import ErrorHandledApi
-from .extend_json import enhance_json_encode, support_jsonp
+from .extend_json import enhance_json_encode, support_jsonp, support_etag, support_compression, support_ndjson, \
+    RawJSON
+from .extend_binary import enhance_binary_encode
 from .marshal import marshal_with_model, quick_marshal
-from .model_converter import register_model_converter
-from .model_reqparse import make_request_parser, populate_model
+from .model_converter import register_model_converter, invalidate_model_cache
+from .model_reqparse import make_request_parser, populate_model, populate_models
 from . import reqparse_fixed_type as fixed_type
-from .model_validates import complex_validates
+from .model_validates import complex_validates, bulk_validate
+from .cache import KeyedCache
+from .response_cache import ResponseCache, MappingBackend
+
+import sys
+if sys.version_info >= (3, 7):
+    from .async_support import AsyncResource, async_marshal_with_model, register_async_model_converter
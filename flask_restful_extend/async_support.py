@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""Async versions of the helpers, for Flask's async views (Flask >= 2.0, installed with `flask[async]`)
+and SQLAlchemy's `AsyncSession` (SQLAlchemy >= 1.4). Requires Python 3.7+, as Flask's async views do
+(`_stream_rows()` is an async generator, that needs Python 3.6 at least).
+
+Under Flask (WSGI), every async view runs in its own event loop, so the async engine should use `NullPool`,
+ otherwise the pooled connections will be used by other event loops.
+`populate_model()` and `make_request_parser()` don't do any IO, they can be used in async views directly.
+"""
+
+__all__ = ['AsyncResource', 'async_marshal_with_model', 'register_async_model_converter']
+
+from flask import current_app, request
+from flask_restful import Resource, fields as _fields
+from werkzeug.exceptions import NotFound
+from sqlalchemy import select
+from sqlalchemy.sql.selectable import Select
+from functools import wraps
+from .marshal import _get_field_definition, _eager_load_options
+from .model_converter import _ModelConverter, _DeferredInstance, _get_request_cache, _coerce_ids
+from . import timing
+import asyncio
+
+
+class AsyncResource(Resource):
+    """A `Resource` whose methods can be coroutine functions:
+
+        class Students(AsyncResource):
+            @async_marshal_with_model(Student, session_factory)
+            async def get(self):
+                return select(Student)
+
+    Flask-RESTful calls the methods synchronously, this class runs the coroutine methods by `app.ensure_sync()`,
+     as Flask does for async views.
+    """
+    def dispatch_request(self, *args, **kwargs):
+        name = request.method.lower()
+        if name == 'head' and not hasattr(self, name):
+            name = 'get'
+
+        meth = getattr(self, name, None)
+        if meth is not None and asyncio.iscoroutinefunction(meth):
+            # Resource instances are created for every request, so we can shadow the method by an instance attribute.
+            setattr(self, name, current_app.ensure_sync(meth))
+        return super(AsyncResource, self).dispatch_request(*args, **kwargs)
+
+
+def async_marshal_with_model(model, session_factory, excludes=None, only=None, extends=None, nested=None,
+                             datetime_format='timestamp', stream=False, yield_per=100):
+    """Async version of `marshal_with_model`, for coroutine functions.
+
+    The function can return a model instance, a list of instances, or a `select()` statement.
+    The statement will be executed by an `AsyncSession` created by `session_factory()`
+     (eg. `sessionmaker(async_engine, class_=AsyncSession)`), the session is closed after the rows were marshalled.
+    If the statement selects the model, the relationships in `nested` will be eager loaded.
+    `AsyncSession` can't lazy load attributes, so the fields in `extends` should not access unloaded attributes.
+
+    If `stream=True`, the statement will be executed by `AsyncSession.stream()`,
+     and the function returns a generator of marshalled rows, fetched `yield_per` rows at a time.
+    The JSON representation installed by `enhance_json_encode()` outputs it as a chunked JSON array.
+    The generator runs the query in its own event loop while the response is being sent,
+     so it must not be consumed in a running event loop.
+
+    Other parameters are same as `marshal_with_model`.
+    """
+    field_definition, serialize = _get_field_definition(model, excludes, only, extends, nested, datetime_format)
+    load_options = _eager_load_options(model, nested) if nested else None
+
+    def decorated(f):
+        @wraps(f)
+        async def wrapper(*args, **kwargs):
+            result = await f(*args, **kwargs)
+
+            if isinstance(result, Select):
+                selects_model = _selects_model(result, model)
+                if load_options and selects_model:
+                    result = result.options(*load_options)
+
+                if stream:
+                    return _iter_async(_stream_rows(session_factory, result, selects_model, serialize, yield_per))
+
+                async with session_factory() as session:
+                    rows = await session.execute(result)
+                    rows = rows.scalars().all() if selects_model else rows.all()
+                    with timing.measure('marshal'):
+                        return [serialize(row) for row in rows]
+
+            with timing.measure('marshal'):
+                if not _fields.is_indexable_but_not_string(result):
+                    return serialize(result)
+                return [serialize(row) for row in result]
+        return wrapper
+    return decorated
+
+
+def _selects_model(statement, model):
+    descriptions = statement.column_descriptions
+    return len(descriptions) == 1 and descriptions[0]['entity'] is model and descriptions[0]['expr'] is model
+
+
+async def _stream_rows(session_factory, statement, selects_model, serialize, yield_per):
+    async with session_factory() as session:
+        result = await session.stream(statement)
+        if selects_model:
+            result = result.scalars()
+        async for partition in result.partitions(yield_per):
+            for row in partition:
+                yield serialize(row)
+
+
+def _iter_async(async_iterator):
+    """Iterate an async generator synchronously, in a dedicated event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                item = loop.run_until_complete(async_iterator.__anext__())
+            except StopAsyncIteration:
+                break
+            yield item
+    finally:
+        loop.run_until_complete(async_iterator.aclose())
+        loop.close()
+
+
+# ===== async model converter =====
+
+def register_async_model_converter(model, app, session_factory):
+    """Async version of `register_model_converter(model, app, defer=True)`.
+
+    The instances were loaded in an async `before_request` hook, by an `AsyncSession` created by `session_factory()`.
+    Instances of the same model are loaded by one `IN` query, and different models are loaded concurrently.
+    The session is closed after the instances were loaded, so they are detached from any session,
+     their column attributes are available, but relationships can't be lazy loaded.
+
+    The instances are cached in the scope of request, the cross requests cache is not supported.
+    """
+    if hasattr(model, 'id'):
+        class Converter(_AsyncModelConverter):
+            _model = model
+            _session_factory = staticmethod(session_factory)
+        app.url_map.converters[model.__name__] = Converter
+
+        if not app.extensions.get('restful_extend_async_converter'):
+            app.extensions['restful_extend_async_converter'] = True
+            app.before_request(_resolve_deferred_instances_async)
+
+
+class _AsyncModelConverter(_ModelConverter):
+    _defer = True
+    _async = True
+    _session_factory = None
+
+    @classmethod
+    async def load_instances_async(cls, inst_ids):
+        """Async version of `load_instances()`"""
+        request_cache = _get_request_cache()
+        instances = {}
+        missing_ids = []
+        for inst_id in inst_ids:
+            instance = request_cache.get((cls._model, inst_id))
+            if instance is None:
+                missing_ids.append(inst_id)
+            else:
+                instances[inst_id] = instance
+
+        if missing_ids:
+            loaded = {}
+            coerced_ids = _coerce_ids(cls._model, missing_ids)
+            if coerced_ids:
+                async with cls._session_factory() as session:
+                    result = await session.execute(
+                        select(cls._model).where(cls._model.id.in_(list(coerced_ids.keys()))))
+                    loaded = {coerced_ids[instance.id]: instance for instance in result.scalars()}
+
+            for inst_id in missing_ids:
+                instance = loaded.get(inst_id)
+                if instance is None:
+                    raise NotFound(u'{}(id={}) not exists，request invalid'.format(cls._model.__name__, inst_id))
+                instances[inst_id] = request_cache[(cls._model, inst_id)] = instance
+
+        return instances
+
+
+async def _resolve_deferred_instances_async():
+    view_args = request.view_args
+    if not view_args:
+        return
+
+    deferred = {
+        # converter: [(arg_name, inst_id), ...]
+    }
+    for name, value in view_args.items():
+        if isinstance(value, _DeferredInstance) and value.converter._async:
+            deferred.setdefault(value.converter, []).append((name, value.inst_id))
+    if not deferred:
+        return
+
+    with timing.measure('converter'):
+        converters = list(deferred.keys())
+        results = await asyncio.gather(*[
+            converter.load_instances_async([inst_id for _, inst_id in deferred[converter]])
+            for converter in converters])
+        for converter, instances in zip(converters, results):
+            for name, inst_id in deferred[converter]:
+                view_args[name] = instances[inst_id]
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Cache the objects that generated from model definitions (field definitions, request parsers...),
+so they don't need to be generated again in every request."""
+
+__all__ = ['KeyedCache', 'definition_cache', 'freeze_key', 'subscribe_modifications']
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Mapper, Session
+from itertools import chain
+from collections import OrderedDict
+import threading
+import time
+
+
+class KeyedCache(object):
+    """A dict based cache, that counts its hits and misses.
+
+    Usage:
+        cache = KeyedCache()
+        value = cache.get_or_create(key, lambda: generate_value())
+        print cache.stats()     # {'hits': 0, 'misses': 1, 'size': 1}
+
+    If the key is not hashable, the value will be generated every time, and never be cached.
+
+    If `maxsize` is given, the least recently used item will be evicted when the cache is full.
+    If `ttl` is given (in seconds), the items will expire after that time.
+    """
+    def __init__(self, maxsize=None, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()      # key: (value, expire_time)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, expire_time = self._data[key]
+            except (KeyError, TypeError):
+                self.misses += 1
+                return default
+
+            if expire_time is not None and expire_time <= time.time():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            if self.maxsize is not None:
+                # move the item to the end, so it becomes the most recently used one
+                del self._data[key]
+                self._data[key] = (value, expire_time)
+
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        try:
+            hash(key)
+        except TypeError:
+            return
+
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, None if self.ttl is None else time.time() + self.ttl)
+            if self.maxsize is not None and len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_create(self, key, factory):
+        value = self.get(key, _missing)
+        if value is _missing:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+    def keys(self):
+        with self._lock:
+            return list(self._data.keys())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses, size=len(self._data))
+
+
+_missing = object()
+
+
+def freeze_key(value):
+    """Transform `only`, `excludes`, `extends`... parameters to a value that can be used as the cache key.
+    dict and list are transformed to tuple (the order of dict items are ignored).
+
+    If there's some unhashable value in it (eg. an unhashable object), the returned value is still unhashable,
+    `KeyedCache` will not cache it."""
+    if isinstance(value, dict):
+        return tuple(sorted(((k, freeze_key(v)) for k, v in value.items()), key=lambda item: item[0]))
+    elif isinstance(value, (list, tuple)):
+        return tuple(freeze_key(v) for v in value)
+    else:
+        return value
+
+
+# Cache the field definitions generated by `marshal_with_model` and the parsers generated by `make_request_parser`.
+definition_cache = KeyedCache(maxsize=1000)
+
+# When new mappers were configured, models may be redefined, so all the generated definitions become unreliable.
+event.listen(Mapper, 'after_configured', definition_cache.clear)
+
+
+# ===== tell the caches which rows were modified by the sessions =====
+
+_modification_subscribers = []
+
+
+def subscribe_modifications(callback):
+    """Call `callback(modified)` when a session modified some instances, so the caches can evict the stale data.
+    `modified` is a set of `(model, identity)`, `identity` is the primary key tuple,
+     it is None for the new instances.
+
+    The callback is called after the session flushed, and again after the transaction committed,
+     in case other requests have cached the old data between flush and commit.
+    Subscribing the same callback multiple times has no effect."""
+    if callback not in _modification_subscribers:
+        _modification_subscribers.append(callback)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_modified(session, flush_context):
+    if not _modification_subscribers:
+        return
+
+    modified = session.info.setdefault('_restful_extend_modified', set())
+    for instance in chain(session.new, session.dirty, session.deleted):
+        modified.add((type(instance), inspect(instance).identity))
+    _notify_modified(modified)
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify_committed(session):
+    _notify_modified(session.info.pop('_restful_extend_modified', None))
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_modified(session, previous_transaction):
+    session.info.pop('_restful_extend_modified', None)
+
+
+def _notify_modified(modified):
+    if modified:
+        for callback in _modification_subscribers:
+            callback(modified)
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
+from flask import Blueprint
 from flask_restful import Api
 from werkzeug.exceptions import HTTPException
+from .extend_json import _when_bound
+from . import timing
 
 class ErrorHandledApi(Api):
     """Usage:
@@ -67,3 +70,32 @@ class ErrorHandledApi(Api):
         """In default, when users was unauthorized, Flask-RESTFul will popup an login dialog for user.
         But for an RESTFul app, this is useless, so I override the method to remove this behavior."""
         return response
+
+    def enable_timing(self, server_timing=True, callback=None):
+        """Record the time spent in flask-restful-extend's hot paths (converters, request parsing, validation,
+        marshalling, JSON encoding, JSONP wrapping) of every request, see `timing` module for the details.
+
+        If `server_timing` is True, the timings will be outputted by the `Server-Timing` header,
+         eg. `Server-Timing: json;dur=1.20, marshal;dur=3.45` (in milliseconds), browsers' devtools can display it.
+        If `callback` is given, it will be called after every request: `callback(timings, response)`,
+         `timings` is a dict: `{phase: seconds}`. You can send it to your metrics system in it.
+
+        If the API was not bound to an app yet, timing is enabled when `api.init_app(app)` is called.
+        """
+        def output_timings(response):
+            timings = timing.get_timings()
+            if server_timing and timings:
+                value = timing.format_server_timing(timings)
+                existing = response.headers.get('Server-Timing')
+                response.headers['Server-Timing'] = value if not existing else existing + ', ' + value
+            if callback:
+                callback(timings, response)
+            return response
+
+        def setup(app):
+            if isinstance(app, Blueprint):
+                app.record_once(lambda state: timing.enable(state.app))
+            else:
+                timing.enable(app)
+            app.after_request(output_timings)
+        _when_bound(self, setup)
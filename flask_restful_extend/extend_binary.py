@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Binary representations (MessagePack, CBOR), they are smaller and faster to parse than JSON."""
+
+__all__ = ['enhance_binary_encode', 'binary_formats']
+
+from flask import current_app, stream_with_context
+from json_encode_manager import JSONEncodeManager
+from collections import OrderedDict
+from .extend_json import _support_format_arg, _buffer_chunks, _load_raw_json
+from . import timing
+from itertools import chain
+import types
+import six
+
+
+def _load_msgpack_format(encoder):
+    import msgpack
+
+    def dumps(data):
+        # msgpack calls `default` for the types it doesn't know (datetime, Decimal...), like the json module does.
+        return msgpack.packb(data, default=encoder, use_bin_type=True)
+
+    # The header of a msgpack array contains its length, so the generators can't be streamed.
+    return dumps, None
+
+
+def _load_cbor_format(encoder):
+    import cbor2
+
+    def dumps(data):
+        # cbor2 encodes datetime and Decimal by itself, convert them by `JSONEncodeManager` first,
+        #  so the output is consistent with JSON.
+        return cbor2.dumps(_to_plain(data, encoder))
+
+    def iter_array(items):
+        # CBOR supports indefinite-length array, so we can stream the items.
+        return _buffer_chunks(chain([b'\x9f'], (dumps(item) for item in items), [b'\xff']))
+
+    return dumps, iter_array
+
+
+binary_formats = OrderedDict([
+    # name: (mediatypes, loader)
+    # `loader(encoder)` returns `(dumps, iter_array)`, `iter_array` is None if the format can't stream an array.
+    ('msgpack', (['application/msgpack', 'application/x-msgpack'], _load_msgpack_format)),
+    ('cbor', (['application/cbor'], _load_cbor_format)),
+])
+
+
+def enhance_binary_encode(api_instance, formats=None, format_arg='format'):
+    """Register binary representations, the client can request them by `Accept` header
+    (eg. `Accept: application/msgpack`), or by the query argument specified by `format_arg` (eg. `?format=msgpack`).
+
+    `formats` can be a list of the names in `binary_formats`: 'msgpack' (requires `msgpack` library),
+     'cbor' (requires `cbor2` library). If it is None, all the formats whose library was installed will be registered.
+
+    The values that JSON doesn't support (datetime, Decimal...) are converted by the `JSONEncodeManager`
+     of `enhance_json_encode()` (if it wasn't called, a new `JSONEncodeManager` is used),
+     so the outputted values are same as the JSON representation.
+    If the view function returns a generator, it will be streamed in CBOR (as an indefinite-length array),
+     but msgpack has to collect all the items first.
+    """
+    encoder = getattr(api_instance, 'json_encoder', None) or JSONEncodeManager()
+
+    for name, (mediatypes, loader) in binary_formats.items():
+        if formats is not None and name not in formats:
+            continue
+        try:
+            dumps, iter_array = loader(encoder)
+        except ImportError:
+            if formats is not None:
+                raise
+            continue
+
+        output = _make_output(name, mediatypes[0], dumps, iter_array)
+        for mediatype in mediatypes:
+            api_instance.representation(mediatype)(output)
+        if format_arg is not None:
+            _support_format_arg(api_instance, format_arg, name, mediatypes[0], output)
+
+
+def _make_output(name, mediatype, dumps, iter_array):
+    def output(data, code, headers=None):
+        data = _load_raw_json(data)
+
+        if isinstance(data, types.GeneratorType):
+            if iter_array is not None:
+                resp = current_app.response_class(stream_with_context(iter_array(data)), code, mimetype=mediatype)
+                resp.headers.extend(headers or {})
+                return resp
+            data = list(data)
+
+        with timing.measure(name):
+            body = dumps(data)
+        resp = current_app.response_class(body, code, mimetype=mediatype)
+        resp.headers.extend(headers or {})
+        return resp
+    return output
+
+
+_plain_types = (six.text_type, bytes, bool, float, type(None)) + six.integer_types
+
+
+def _to_plain(value, encoder):
+    """Convert the value to the types that JSON supports, by `encoder`."""
+    if isinstance(value, _plain_types):
+        return value
+    elif isinstance(value, dict):
+        return {k: _to_plain(v, encoder) for k, v in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [_to_plain(v, encoder) for v in value]
+    else:
+        return _to_plain(encoder(value), encoder)
@@ -1,34 +1,207 @@
 # -*- coding: utf-8 -*-
 
-from flask import request, current_app, make_response
+from flask import request, current_app, make_response, stream_with_context, after_this_request, g
+from flask_restful import abort
 from json_encode_manager import JSONEncodeManager
+from collections import OrderedDict
+from . import timing
+import types
 import json
+import re
+import hashlib
+import zlib
 
 
-def enhance_json_encode(api_instance, extra_settings=None):
+# When streaming a JSON array, buffer the dumped items until the chunk reached this size (in bytes),
+#  so we won't write to the client once per item.
+_stream_chunk_size = 16 * 1024
+
+
+def _load_stdlib_backend():
+    return lambda data, settings: json.dumps(data, **settings)
+
+
+def _load_orjson_backend():
+    import orjson
+
+    def dumps(data, settings):
+        # Let datetime objects go through the `default` hook, so `JSONEncodeManager` decides how to encode them.
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if settings.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        if settings.get('sort_keys'):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(data, default=settings.get('default'), option=option)
+    return dumps
+
+
+def _load_rapidjson_backend():
+    import rapidjson
+
+    def dumps(data, settings):
+        return rapidjson.dumps(data, default=settings.get('default'), ensure_ascii=settings.get('ensure_ascii', True),
+                               indent=settings.get('indent'), sort_keys=settings.get('sort_keys', False))
+    return dumps
+
+
+def _load_ujson_backend():
+    import ujson
+
+    def dumps(data, settings):
+        return ujson.dumps(data, default=settings.get('default'), ensure_ascii=settings.get('ensure_ascii', True),
+                           indent=settings.get('indent') or 0, sort_keys=settings.get('sort_keys', False),
+                           escape_forward_slashes=False)
+    return dumps
+
+
+json_backends = OrderedDict([
+    # name: loader
+    # Sorted by speed, `backend='auto'` will use the first one that was installed.
+    ('orjson', _load_orjson_backend),
+    ('rapidjson', _load_rapidjson_backend),
+    ('ujson', _load_ujson_backend),
+    ('json', _load_stdlib_backend),
+])
+
+
+class RawJSON(bytes):
+    """Already dumped JSON data. If a view function returns it,
+    the JSON representation installed by `enhance_json_encode()` will output it directly, without dumping again."""
+    pass
+
+
+def load_json_backend(name='json'):
+    """Return the `dumps(data, settings)` function of the specified JSON backend.
+    If `name` is 'auto', return the fastest one that was installed."""
+    if name != 'auto':
+        return json_backends[name]()
+
+    for loader in json_backends.values():
+        try:
+            return loader()
+        except ImportError:
+            pass
+
+
+def enhance_json_encode(api_instance, extra_settings=None, backend='json'):
     """use `JSONEncodeManager` replace default `output_json` function of Flask-RESTful
-    for the advantage of use `JSONEncodeManager`, please see https://github.com/anjianshi/json_encode_manager"""
+    for the advantage of use `JSONEncodeManager`, please see https://github.com/anjianshi/json_encode_manager
+
+    If the view function returns a `RawJSON`, it will be outputted as is.
+
+    If the data to output is a generator (eg. the result of `marshal_with_model(stream=True)`),
+    it will be outputted as a chunked JSON array, item by item, instead of dumping the whole data at once.
+
+    `backend` specifies the library to dump the data, can be 'json' (the standard library), 'orjson', 'rapidjson',
+    'ujson', or 'auto' (use the fastest one that was installed, fall back to the standard library).
+    All of them use `JSONEncodeManager` as the `default` hook, so the registered encoders still work.
+    But the third-party backends only support `default`, `ensure_ascii`, `indent` and `sort_keys` settings,
+    other settings in `extra_settings` will be ignored. (And orjson always indent by 2 spaces, never escape non-ASCII
+    characters.)
+
+    The dump function was saved as `api_instance.json_dumps(data, indent=True)`,
+    it returns `str` or `bytes` depends on the backend. Pass `indent=False` to always dump the data in one line."""
     api_instance.json_encoder = JSONEncodeManager()
+    backend_dumps = load_json_backend(backend)
 
     dumps_settings = {} if extra_settings is None else extra_settings
     dumps_settings['default'] = api_instance.json_encoder
     dumps_settings.setdefault('ensure_ascii', False)
 
-    @api_instance.representation('application/json')
-    def output_json(data, code, headers=None):
+    def dumps(data, indent=True):
         if current_app.debug:
             dumps_settings.setdefault('indent', 4)
             dumps_settings.setdefault('sort_keys', True)
+        return backend_dumps(data, dumps_settings if indent else dict(dumps_settings, indent=None))
+    api_instance.json_dumps = dumps
 
-        dumped = json.dumps(data, **dumps_settings)
+    @api_instance.representation('application/json')
+    def output_json(data, code, headers=None):
+        if isinstance(data, types.GeneratorType):
+            resp = current_app.response_class(
+                stream_with_context(_iter_json_array(data, dumps, current_app.debug or 'indent' in dumps_settings)),
+                code, mimetype='application/json')
+            resp.headers.extend(headers or {})
+            return resp
+
+        if isinstance(data, RawJSON):
+            resp = make_response(bytes(data), code)
+            resp.headers.extend(headers or {})
+            return resp
+
+        with timing.measure('json'):
+            dumped = dumps(data)
         if 'indent' in dumps_settings:
-            dumped += '\n'
+            dumped += b'\n' if isinstance(dumped, bytes) else '\n'
 
         resp = make_response(dumped, code)
         resp.headers.extend(headers or {})
         return resp
 
 
+def _iter_json_array(items, dumps, indent):
+    separator = b',\n' if indent else b', '
+
+    def fragments():
+        yield b'[\n' if indent else b'['
+        first = True
+        for item in items:
+            dumped = _to_bytes(dumps(item))
+            yield dumped if first else separator + dumped
+            first = False
+        yield b'\n]\n' if indent else b']'
+
+    return _buffer_chunks(fragments())
+
+
+def _buffer_chunks(fragments):
+    """Join the dumped fragments into chunks of about `_stream_chunk_size` bytes,
+    so a streamed response isn't written in lots of tiny pieces."""
+    chunk = []
+    chunk_size = 0
+    for fragment in fragments:
+        chunk.append(fragment)
+        chunk_size += len(fragment)
+        if chunk_size >= _stream_chunk_size:
+            yield b''.join(chunk)
+            chunk = []
+            chunk_size = 0
+
+    if chunk:
+        yield b''.join(chunk)
+
+
+def _vary_on(*header_names):
+    """The response of current request varies on these request headers (eg. the layout chosen by a header).
+    They are added to the `Vary` header of the response, and to the ETag generated by `support_etag()`."""
+    vary_headers = getattr(g, '_restful_extend_vary', None)
+    if vary_headers is None:
+        vary_headers = g._restful_extend_vary = []
+
+        @after_this_request
+        def add_vary(response):
+            for header_name in vary_headers:
+                response.vary.add(header_name)
+            return response
+
+    for header_name in header_names:
+        if header_name not in vary_headers:
+            vary_headers.append(header_name)
+
+
+def _get_vary_values():
+    return [request.headers.get(header_name, '') for header_name in getattr(g, '_restful_extend_vary', ())]
+
+
+def _load_raw_json(data):
+    """The representations that are not JSON have to decode the `RawJSON` (eg. a cached response) first."""
+    return json.loads(data.decode('utf-8')) if isinstance(data, RawJSON) else data
+
+
+def _to_bytes(dumped):
+    return dumped if isinstance(dumped, bytes) else dumped.encode('utf-8')
+
+
 def support_jsonp(api_instance, callback_name_source='callback'):
     """Let API instance can respond jsonp request automatically.
 
@@ -41,17 +214,282 @@ def support_jsonp(api_instance, callback_name_source='callback'):
          And system will handle request according to its return value.
 
     default support format：url?callback=js_callback_name
+
+    The callback name must be a JavaScript identifier, or a dotted path of identifiers (eg. `jQuery.cb`),
+    otherwise respond 400.
+    The response body won't be decoded or copied, the callback name and the parenthesis are written around it,
+    so it also works with streamed responses (eg. the result of `marshal_with_model(stream=True)`).
     """
     output_json = api_instance.representations['application/json']
 
     @api_instance.representation('application/json')
     def handle_jsonp(data, code, headers=None):
-        resp = output_json(data, code, headers)
-
+        callback = None
         if code == 200:
             callback = request.args.get(callback_name_source, False) if not callable(callback_name_source) \
                 else callback_name_source()
-            if callback:
-                resp.set_data(str(callback) + '(' + resp.get_data().decode("utf-8") + ')')
+            if callback and not _callback_name_pattern.match(str(callback)):
+                abort(400, message='invalid JSONP callback name')
+
+        resp = output_json(data, code, headers)
+        if callback:
+            with timing.measure('jsonp'):
+                _wrap_jsonp(resp, str(callback).encode('ascii'))
+        return resp
+
+
+_callback_name_pattern = re.compile(r'^[a-zA-Z_$][0-9a-zA-Z_$]*(\.[a-zA-Z_$][0-9a-zA-Z_$]*)*\Z')
+
+
+def _wrap_jsonp(resp, callback):
+    prefix = callback + b'('
+    suffix = b')'
+    if resp.is_streamed:
+        resp.response = _iter_jsonp(prefix, resp.response, suffix)
+    else:
+        resp.response = [prefix] + list(resp.response) + [suffix]
+        resp.content_length = resp.calculate_content_length()
+
+
+def _iter_jsonp(prefix, body, suffix):
+    try:
+        yield prefix
+        for chunk in body:
+            yield chunk
+        yield suffix
+    finally:
+        # if the client disconnected, the original body (eg. a `stream_with_context` generator) should also be closed
+        if hasattr(body, 'close'):
+            body.close()
+
+
+def support_etag(api_instance, version_source=None):
+    """Add `ETag` header to the JSON responses, and respond 304 if the request's `If-None-Match` matches it.
 
+    If `version_source` is None, the ETag is the hash of the response body (streamed responses are skipped).
+    Otherwise it should be a callback, that returns the version of the resource (eg. the max `updated_at` of
+    the queried table), the ETag was generated from the version, the request path and the request headers
+    the response varies on (eg. the layout header of `marshal_with_model`), and when it matches
+    the request, the data won't be encoded at all. Return None in the callback to fall back to the body hash.
+
+    Only successful GET and HEAD requests were handled.
+    Call this function after `support_jsonp()`, and before `support_compression()`.
+    """
+    output_json = api_instance.representations['application/json']
+
+    @api_instance.representation('application/json')
+    def handle_etag(data, code, headers=None):
+        if code != 200 or request.method not in ('GET', 'HEAD'):
+            return output_json(data, code, headers)
+
+        version = version_source() if version_source else None
+        if version is not None:
+            etag_source = u'|'.join([u'{}'.format(version), request.full_path] + _get_vary_values())
+            etag = hashlib.sha1(etag_source.encode('utf-8')).hexdigest()
+            if request.if_none_match.contains_weak(etag):
+                resp = current_app.response_class(status=304)
+                resp.headers.extend(headers or {})
+                resp.set_etag(etag)
+                return resp
+            resp = output_json(data, code, headers)
+            resp.set_etag(etag)
+            return resp
+
+        resp = output_json(data, code, headers)
+        if resp.is_streamed:
+            return resp
+        with timing.measure('etag'):
+            digest = hashlib.sha1()
+            for chunk in resp.response:
+                digest.update(_to_bytes(chunk))
+            resp.set_etag(digest.hexdigest())
+        return resp.make_conditional(request.environ)
+
+
+def _load_brotli_compressor(level):
+    import brotli
+    return _BrotliCompressor(brotli.Compressor(quality=level))
+
+
+class _BrotliCompressor(object):
+    """Make brotli's compressor has the same interface as zlib's."""
+    def __init__(self, compressor):
+        self.compressor = compressor
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+compressors = {
+    # encoding: (load_compressor(level), default_level)
+    'br': (_load_brotli_compressor, 4),
+    'gzip': (lambda level: zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS), 6),
+    'deflate': (lambda level: zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS), 6),
+}
+
+
+def support_compression(api_instance, min_size=1024, encodings=('br', 'gzip', 'deflate'), levels=None):
+    """Compress the JSON responses according to the request's `Accept-Encoding` header.
+
+    Responses smaller than `min_size` (in bytes) won't be compressed, streamed responses are always compressed,
+    chunk by chunk.
+    `encodings` are the supported encodings, in the order of preference, when the client accepts multiple ones
+     with the same quality, the first one will be used. 'br' requires the `brotli` library,
+     if it was not installed, it will be ignored.
+    `levels` can specify the compression level of every encoding: `{encoding: level}`,
+     default is 6 for gzip and deflate, 4 for brotli.
+
+    If the response has an ETag (see `support_etag()`), it becomes a weak ETag after compressed.
+    Call this function after all other `support_xxx()` functions.
+    """
+    available = []
+    for encoding in encodings:
+        load_compressor, default_level = compressors[encoding]
+        level = (levels or {}).get(encoding, default_level)
+        try:
+            load_compressor(level)
+        except ImportError:
+            continue
+        available.append((encoding, load_compressor, level))
+
+    output_json = api_instance.representations['application/json']
+
+    @api_instance.representation('application/json')
+    def handle_compression(data, code, headers=None):
+        resp = output_json(data, code, headers)
+        resp.vary.add('Accept-Encoding')
+        if not available or resp.status_code == 304 or 'Content-Encoding' in resp.headers:
+            return resp
+        if not resp.is_streamed and resp.calculate_content_length() < min_size:
+            return resp
+
+        encoding = request.accept_encodings.best_match([item[0] for item in available])
+        if encoding is None:
+            return resp
+        _, load_compressor, level = next(item for item in available if item[0] == encoding)
+
+        compressor = load_compressor(level)
+        with timing.measure('compress'):
+            if resp.is_streamed:
+                resp.response = _iter_compressed(resp.response, compressor)
+            else:
+                resp.response = [compressor.compress(b''.join(_to_bytes(chunk) for chunk in resp.response)),
+                                 compressor.flush()]
+                resp.content_length = resp.calculate_content_length()
+
+        resp.headers['Content-Encoding'] = encoding
+        etag, weak = resp.get_etag()
+        if etag and not weak:
+            resp.set_etag(etag, weak=True)
         return resp
+
+
+def _iter_compressed(body, compressor):
+    try:
+        for chunk in body:
+            compressed = compressor.compress(_to_bytes(chunk))
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+
+def support_ndjson(api_instance, format_arg='format'):
+    """Register the `application/x-ndjson` (JSON Lines) representation, every item of the data is outputted
+    as one line of JSON. The response is always streamed, so if the view function returns a generator
+    (eg. the result of `marshal_with_model(stream=True)`), the items are sent as they were marshalled,
+    the server memory stays constant. If the data is not a list or generator (eg. an error message),
+    it will be outputted as one line.
+
+    The client can request it by `Accept: application/x-ndjson` header.
+    If `format_arg` is not None, the client can also request it by the query argument, eg. `?format=ndjson`.
+    (Call this function after `support_jsonp()`, `support_etag()` and `support_compression()`,
+     they only handle the JSON responses.)
+
+    Call `enhance_json_encode()` before this function, the items are dumped by its dump function.
+    """
+    dumps = getattr(api_instance, 'json_dumps', None)
+    if dumps is None:
+        raise ValueError('call enhance_json_encode() on the API before support_ndjson()')
+
+    @api_instance.representation('application/x-ndjson')
+    def output_ndjson(data, code, headers=None):
+        data = _load_raw_json(data)
+        if not isinstance(data, (list, tuple, types.GeneratorType)):
+            data = [data]
+
+        resp = current_app.response_class(stream_with_context(_iter_ndjson(data, dumps)), code,
+                                          mimetype='application/x-ndjson')
+        resp.headers.extend(headers or {})
+        return resp
+
+    if format_arg is not None:
+        _support_format_arg(api_instance, format_arg, 'ndjson', 'application/x-ndjson', output_ndjson)
+
+
+def _iter_ndjson(items, dumps):
+    return _buffer_chunks(_to_bytes(dumps(item, indent=False)) + b'\n' for item in items)
+
+
+def _support_format_arg(api_instance, format_arg, format_name, mediatype, output):
+    """Let the client choose the representation by query argument, eg. `?format=ndjson`.
+
+    Flask-RESTful picks the representation by the `Accept` header, so the request still goes to the JSON
+    representation, we hand it over to `output` from there.
+    Flask-RESTful overwrites the response's `Content-Type` with the mediatype it picked,
+    so an `after_request` hook restores it.
+    """
+    output_json = api_instance.representations['application/json']
+
+    @api_instance.representation('application/json')
+    def handle_format_arg(data, code, headers=None):
+        if request.args.get(format_arg) != format_name:
+            return output_json(data, code, headers)
+        resp = output(data, code, headers)
+        resp.restful_extend_mediatype = mediatype
+        return resp
+
+    if not getattr(api_instance, '_restore_mediatype_registered', False):
+        api_instance._restore_mediatype_registered = True
+        _when_bound(api_instance, lambda app: app.after_request(_restore_mediatype))
+
+
+def _when_bound(api_instance, setup):
+    """Call `setup(app)` with the app (or blueprint) the API is bound to, eg. to register request hooks.
+
+    If the API was created without an app (`api = Api()`, then `api.init_app(app)` in the app factory),
+     `setup` is called when `init_app()` is called, for every app it is called with.
+    """
+    if api_instance.app is not None:
+        setup(api_instance.app)
+        return
+
+    setups = api_instance.__dict__.get('_restful_extend_setups')
+    if setups is None:
+        setups = api_instance._restful_extend_setups = []
+        bound_apps = api_instance._restful_extend_bound_apps = []
+        original_init_app = api_instance.init_app
+
+        def init_app(app):
+            original_init_app(app)
+            bound_apps.append(app)
+            for fn in setups:
+                fn(app)
+        # Flask-RESTful doesn't provide a hook of `init_app()`, so shadow it by an instance attribute
+        api_instance.init_app = init_app
+
+    setups.append(setup)
+    for app in api_instance._restful_extend_bound_apps:
+        setup(app)
+
+
+def _restore_mediatype(response):
+    mediatype = getattr(response, 'restful_extend_mediatype', None)
+    if mediatype is not None:
+        response.headers['Content-Type'] = mediatype
+    return response
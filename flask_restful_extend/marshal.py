@@ -1,11 +1,31 @@
 # -*- coding: utf-8 -*-
-from flask_restful import fields as _fields, marshal_with as _marshal_with
+from flask_restful import fields as _fields, marshal as _marshal, abort
+from flask import request
+from sqlalchemy import inspect, or_, and_
+from sqlalchemy.orm import Query, load_only, selectinload, joinedload
 from functools import wraps
+from .cache import KeyedCache, definition_cache, freeze_key
+from .extend_json import RawJSON, load_json_backend, _to_bytes, _vary_on
+from . import timing
+from operator import attrgetter
+from collections import OrderedDict
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+from datetime import datetime, date
+from decimal import Decimal
+from six.moves.urllib.parse import urlencode
+import operator
+import base64
+import json
 import time
 import six
 
 
-def marshal_with_model(model, excludes=None, only=None, extends=None):
+def marshal_with_model(model, excludes=None, only=None, extends=None, stream=False, yield_per=100,
+                       projection=False, paginate=None, per_page=20, sort_by=None, nested=None, fields_arg=None,
+                       datetime_format='timestamp', parallel=None, chunk_size=10000, layout_arg=None):
     """With this decorator, you can return ORM model instance, or ORM query in view function directly.
     We'll transform these objects to standard python data structures, like Flask-RESTFul's `marshal_with` decorator.
     And, you don't need define fields at all.
@@ -16,6 +36,79 @@ def marshal_with_model(model, excludes=None, only=None, extends=None):
     If you want return fields that outside of model, or overwrite the type of some fields,
     use `extends` parameter to specify them.
 
+    `datetime_format` decides how `datetime` and `date` columns are outputted:
+        'timestamp'     (default) timestamp in seconds, by `time.mktime()`, naive datetime are treated as local time.
+                        It's slow, and it ignores the timezone of aware datetime.
+        'epoch'         UTC timestamp in seconds (float), naive datetime are treated as UTC,
+                        aware datetime are converted to UTC.
+        'epoch_ms'      same as 'epoch', but in milliseconds (int).
+        'iso'           ISO 8601 string, eg. "2014-05-13T16:53:20" or "2014-05-13T16:53:20+08:00".
+    'epoch' and 'epoch_ms' are calculated by arithmetic, they are much faster than 'timestamp'.
+
+    To output the related instances of a relationship, specify it in `nested` parameter:
+        {relationship_name: spec}
+    `spec` can be None (output all columns of the related model), or a dict, that can contain `only`, `excludes`,
+     `extends` and `nested` (yes, nested in nested), they have the same meaning as parameters of this function.
+    The value of a one-to-many or many-to-many relationship will be outputted as a list, others as a dict (or null).
+    If the view function returns a query, the relationships will be eager loaded,
+     so the related instances of all rows are loaded by a constant number of queries, instead of one query per row.
+    By default, collections are loaded by `selectinload()`, and many-to-one relationships by `joinedload()`,
+     you can specify it by `load` key in `spec`: 'selectin' or 'joined'.
+
+    If `fields_arg` was given (eg. 'fields'), the client can choose the fields to output by the query argument
+     of this name, eg. `?fields=id,name`. The chosen fields must be in the fields defined by this decorator,
+     otherwise respond 400. If the client didn't pass it, all the fields will be outputted.
+    If the chosen fields are all columns of the model, the returned query will only select these columns
+     (like `projection=True`), otherwise it follows the `projection` parameter.
+    The relationships in `nested` that were not chosen won't be loaded.
+    The serializers of the chosen field sets are cached (the 100 most recently used ones).
+
+    A list of objects repeats every field name in every object. If `layout_arg` was given (eg. 'layout'),
+     the client can choose a columnar layout by the query argument of this name, or by `X-Response-Layout` header:
+        ?layout=table       {"columns": ["id", "name"], "rows": [[1, "a"], [2, "b"]]}
+        ?layout=columns     {"id": [1, 2], "name": ["a", "b"]}
+        ?layout=objects     [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]     (the default)
+    The rows are generated from the field definition directly, no intermediate dicts were built
+     (unless there's some fields in `extends` or `nested`).
+    It only affects list results, and can't be used with `paginate`, `stream` or `parallel`.
+    Unknown layouts respond 400. The response has a `Vary: X-Response-Layout` header.
+
+    For export-style endpoints that output a huge number of rows, pass a `concurrent.futures.ProcessPoolExecutor`
+     (or any executor) as `parallel`. The rows will be split into chunks of `chunk_size` rows,
+     every chunk will be formatted and dumped to JSON in the executor, then the fragments are joined into
+     one JSON array, and returned as a `RawJSON`, so the JSON representation outputs it directly
+     (requires `enhance_json_encode()`). If there's only one chunk, it will be dumped in the current process.
+    Only the fields generated from the columns can be dumped in other processes, so `parallel` can't be used
+     with `extends` or `nested`, it also can't be used with `stream` or `paginate`.
+    The dumped JSON may use different separators from the representation's JSON backend.
+
+    If the view function returns a large query, set `stream=True`.
+    Then the query will be executed with `Query.yield_per(yield_per)`, and every row will be marshalled as it arrives,
+    the view function's return value becomes a generator of marshalled rows.
+    The JSON representation installed by `enhance_json_encode()` will output it as a chunked JSON array,
+    so the whole result set will never be materialized in memory.
+    (Because the response body was generated after the view function returns,
+     an error raised during the streaming can't change the response's status code any more.)
+
+    If you narrowed the output by `only` or `excludes`, set `projection=True`, then if the view function returns a query
+    of the model, the query will only load the columns to be outputted.
+    If all the fields were columns of the model, the query will be rewritten by `Query.with_entities()`,
+     and we marshal from the lightweight row tuples, no model instance will be built.
+    Otherwise (eg. there's some fields in `extends`), the query will be rewritten by `load_only()`,
+     notice the columns not in the field definition will be lazy loaded if you accessed them.
+
+    If the view function returns a query of a large table, set `paginate` to 'envelope' or 'link',
+    then only `per_page` rows will be returned in one request, by keyset pagination:
+    the rows are ordered by the `sort_by` column (prefix it with '-' for descending order; default is the primary key)
+    and the primary key, the next page is fetched by `WHERE (sort_col, pk) > (last_sort_value, last_pk)`
+    instead of `OFFSET`, so fetching a deep page costs the same as the first page.
+    The position of the next page is encoded in a cursor token, the client passes it by the `cursor` query argument.
+    If `paginate` is 'envelope', the response will be `{"items": [...], "next_cursor": "token or null"}`.
+    If `paginate` is 'link', the response is still the list of rows, the url of the next page is in the
+     `Link: <url>; rel="next"` header.
+    The query's original ORDER BY will be replaced, and it should not have LIMIT or OFFSET.
+    The `sort_by` column should not contain NULL values.
+
     Notice: this function only support `Flask-SQLAlchemy`
 
     Example:
@@ -39,6 +132,88 @@ def marshal_with_model(model, excludes=None, only=None, extends=None):
                 student.age = "young" if student.age < 18 else "old"    # transform int field to string
                 return student
     """
+    if datetime_format not in _datetime_fields:
+        raise ValueError('datetime_format must be one of: ' + ', '.join(sorted(_datetime_fields.keys())))
+    field_definition, serialize = _get_field_definition(model, excludes, only, extends, nested, datetime_format)
+    load_options = _eager_load_options(model, nested) if nested else None
+    if parallel is not None and serialize.portable_names is None:
+        raise ValueError('parallel marshalling only support the fields generated from columns')
+    if parallel is not None and (stream or paginate is not None):
+        raise ValueError('parallel can\'t be used with stream or paginate')
+    sparse_definitions = KeyedCache(maxsize=100) if fields_arg is not None else None
+    if paginate is not None:
+        if paginate not in ('envelope', 'link'):
+            raise ValueError("paginate must be 'envelope' or 'link'")
+        key_columns, descending = _get_key_columns(model, sort_by)
+    if layout_arg is not None and (paginate is not None or stream or parallel is not None):
+        raise ValueError('layout_arg can\'t be used with paginate, stream or parallel')
+
+    def decorated(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            result = f(*args, **kwargs)
+            if layout_arg is not None:
+                _vary_on(layout_header)
+            with timing.measure('marshal'):
+                current_serialize, current_options, current_projection = serialize, load_options, projection
+                if fields_arg is not None and request.args.get(fields_arg):
+                    current_serialize, current_options, current_projection = _get_sparse_definition(
+                        sparse_definitions, request.args[fields_arg], model, field_definition, nested, projection)
+
+                if not _fields.is_indexable_but_not_string(result):
+                    return current_serialize(result)
+
+                if current_options and isinstance(result, Query):
+                    result = result.options(*current_options)
+
+                if paginate is not None and isinstance(result, Query):
+                    return _paginate_query(result, model, current_serialize, current_projection, paginate, per_page,
+                                           key_columns, descending)
+
+                layout = _get_layout(layout_arg) if layout_arg is not None else None
+                if layout is not None:
+                    return _columnar_marshal(result, model, current_serialize, current_projection, layout)
+
+                if parallel is not None:
+                    return _parallel_marshal(result, model, current_serialize, parallel, chunk_size)
+
+                row_serialize = current_serialize
+                if current_projection and isinstance(result, Query):
+                    result, row_serialize = _project_query(result, model, current_serialize)
+
+                if stream:
+                    return _iter_marshal(result, row_serialize, yield_per)
+                else:
+                    return [row_serialize(row) for row in result]
+        # `ResponseCache` reads these to build the cache key and find out the tables to watch
+        wrapper.marshal_fields = tuple(sorted(field_definition.keys()))
+        wrapper.marshal_tables = _get_tables(model, nested)
+        wrapper.marshal_vary_headers = (layout_header,) if layout_arg is not None else ()
+        return wrapper
+    return decorated
+
+
+def quick_marshal(*args, **kwargs):
+    """In some case, one view functions may return different model in different situation.
+    Use `marshal_with_model` to handle this situation was tedious.
+    This function can simplify this process.
+
+    Usage：
+    quick_marshal(args_to_marshal_with_model)(db_instance_or_query)
+    """
+    @marshal_with_model(*args, **kwargs)
+    def fn(value):
+        return value
+    return fn
+
+
+def _get_field_definition(model, excludes=None, only=None, extends=None, nested=None, datetime_format='timestamp'):
+    """Return the field definition and its compiled serializer.
+    They are cached by `definition_cache`, so `quick_marshal()` won't regenerate them in every call.
+
+    Field instances in `extends` (or in the `extends` of `nested` specs) are hashed by identity,
+     a new instance is created in every call of `quick_marshal(model, extends={'x': fields.String()})`,
+     so the definitions that contain field instances are not cached, otherwise every call adds a new entry."""
     if isinstance(excludes, six.string_types):
         excludes = [excludes]
     if excludes and only:
@@ -46,6 +221,26 @@ def marshal_with_model(model, excludes=None, only=None, extends=None):
     elif isinstance(only, six.string_types):
         only = [only]
 
+    if _contains_field_instance(extends) or _contains_field_instance(nested):
+        return _make_field_definition(model, excludes, only, extends, nested, datetime_format)
+
+    key = ('marshal', model, freeze_key(excludes), freeze_key(only), freeze_key(extends), freeze_key(nested),
+           datetime_format)
+    return definition_cache.get_or_create(
+        key, lambda: _make_field_definition(model, excludes, only, extends, nested, datetime_format))
+
+
+def _contains_field_instance(value):
+    if isinstance(value, _fields.Raw):
+        return True
+    elif isinstance(value, dict):
+        return any(_contains_field_instance(v) for v in value.values())
+    elif isinstance(value, (list, tuple)):
+        return any(_contains_field_instance(v) for v in value)
+    return False
+
+
+def _make_field_definition(model, excludes, only, extends, nested, datetime_format):
     field_definition = {}
     for col in model.__table__.columns:
         if only:
@@ -54,39 +249,365 @@ def marshal_with_model(model, excludes=None, only=None, extends=None):
         elif excludes and col.name in excludes:
                 continue
 
-        field_definition[col.name] = _type_map[col.type.python_type.__name__]
+        type_name = col.type.python_type.__name__
+        field_definition[col.name] = _datetime_fields[datetime_format] if type_name in ('datetime', 'date') \
+            else _type_map[type_name]
+
+    if nested:
+        relationships = inspect(model).relationships
+        for name, spec in nested.items():
+            spec = spec or {}
+            relationship = relationships[name]
+            _, nested_serialize = _get_field_definition(relationship.mapper.class_, spec.get('excludes'),
+                                                        spec.get('only'), spec.get('extends'), spec.get('nested'),
+                                                        datetime_format)
+            field_definition[name] = _RelationshipField(nested_serialize, relationship.uselist)
 
     if extends is not None:
         for k, v in extends.items():
             field_definition[k] = v
 
-    def decorated(f):
-        @wraps(f)
-        @_marshal_with(field_definition)
-        def wrapper(*args, **kwargs):
-            result = f(*args, **kwargs)
-            return result if not _fields.is_indexable_but_not_string(result) else [v for v in result]
-        return wrapper
-    return decorated
+    return field_definition, _compile_serializer(field_definition)
 
 
-def quick_marshal(*args, **kwargs):
-    """In some case, one view functions may return different model in different situation.
-    Use `marshal_with_model` to handle this situation was tedious.
-    This function can simplify this process.
+def _eager_load_options(model, nested, parent=None):
+    """Generate the loader options to eager load the relationships in the `nested` spec."""
+    options = []
+    relationships = inspect(model).relationships
+    for name, spec in nested.items():
+        spec = spec or {}
+        relationship = relationships[name]
+        load = spec.get('load') or ('selectin' if relationship.uselist else 'joined')
+        if load not in ('selectin', 'joined'):
+            raise ValueError("load must be 'selectin' or 'joined'")
 
-    Usage：
-    quick_marshal(args_to_marshal_with_model)(db_instance_or_query)
+        attr = getattr(model, name)
+        if parent is None:
+            loader = selectinload(attr) if load == 'selectin' else joinedload(attr)
+        else:
+            loader = parent.selectinload(attr) if load == 'selectin' else parent.joinedload(attr)
+        options.append(loader)
+
+        if spec.get('nested'):
+            options += _eager_load_options(relationship.mapper.class_, spec['nested'], loader)
+    return options
+
+
+def _get_tables(model, nested):
+    """Return the names of the tables that the output depends on."""
+    tables = set(table.name for table in inspect(model).tables)
+    relationships = inspect(model).relationships
+    for name, spec in (nested or {}).items():
+        tables.update(_get_tables(relationships[name].mapper.class_, (spec or {}).get('nested')))
+        if relationships[name].secondary is not None:
+            tables.add(relationships[name].secondary.name)
+    return tuple(sorted(tables))
+
+
+def _iter_marshal(result, serialize, yield_per):
+    if isinstance(result, Query):
+        result = result.yield_per(yield_per)
+    for row in result:
+        yield serialize(row)
+
+
+def _project_query(query, model, serialize):
+    """Rewrite a query of the model to only load the columns in the field definition.
+    Return the rewritten query and the function to serialize its rows."""
+    descriptions = query.column_descriptions
+    if len(descriptions) != 1 or descriptions[0]['entity'] is not model or descriptions[0]['expr'] is not model:
+        # Only handle the query that exactly select the model, other queries are returned intact.
+        return query, serialize
+
+    columns = model.__table__.columns
+    if serialize.serialize_values is not None and all(key in columns for key in serialize.fast_keys):
+        return query.with_entities(*[columns[key] for key in serialize.fast_keys]), serialize.serialize_values
+
+    # the columns read by the other fields (eg. a column overridden in `extends`) must be loaded too,
+    #  otherwise they are lazy loaded row by row
+    column_keys = [key for key in OrderedDict.fromkeys(serialize.attributes) if key in columns]
+    mapper = inspect(model)
+    return (query.options(load_only(*[mapper.get_property_by_column(columns[key]).class_attribute
+                                      for key in column_keys])),
+            serialize)
+
+
+layout_header = 'X-Response-Layout'
+
+
+def _get_layout(layout_arg):
+    """Return the columnar layout chosen by the client, or None for the default layout."""
+    layout = request.args.get(layout_arg) or request.headers.get(layout_header)
+    if not layout or layout == 'objects':
+        return None
+    if layout not in ('table', 'columns'):
+        abort(400, message='unknown layout: {}'.format(layout))
+    return layout
+
+
+def _columnar_marshal(result, model, serialize, projection, layout):
+    if isinstance(result, Query) and projection:
+        result, row_serialize = _project_query(result, model, serialize)
+        if row_serialize is not serialize:
+            # rows of `with_entities()`, they are the values in the order of the fields
+            rows = [serialize.format_values(row) for row in result]
+        else:
+            rows = [serialize.serialize_row(obj) for obj in result]
+    else:
+        rows = [serialize.serialize_row(obj) for obj in result]
+
+    if layout == 'table':
+        return dict(columns=serialize.keys, rows=rows)
+    columns = list(zip(*rows)) if rows else [()] * len(serialize.keys)
+    return {key: list(column) for key, column in zip(serialize.keys, columns)}
+
+
+def _parallel_marshal(result, model, serialize, executor, chunk_size):
+    """Dump the rows to a JSON array in the executor, chunk by chunk."""
+    if isinstance(result, Query):
+        result, row_serialize = _project_query(result, model, serialize)
+        if row_serialize is not serialize:
+            # rows of `with_entities()`, they are the values in the order of `fast_keys` already
+            rows = [tuple(row) for row in result]
+        else:
+            rows = [serialize.get_values(obj) for obj in result]
+    else:
+        rows = [serialize.get_values(obj) for obj in result]
+
+    keys, names = serialize.fast_keys, serialize.portable_names
+    chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    if len(chunks) <= 1:
+        fragments = [_dump_chunk(keys, names, chunk) for chunk in chunks]
+    else:
+        fragments = executor.map(_dump_chunk, [keys] * len(chunks), [names] * len(chunks), chunks)
+    return RawJSON(b'[' + b','.join(fragment for fragment in fragments if fragment) + b']')
+
+
+_chunk_dumps = None
+
+
+def _dump_chunk(keys, names, rows):
+    """Format the rows (sequences of values) by the fields in `_portable_fields`,
+    and dump them to the items of a JSON array (without the brackets).
+    This function runs in the worker processes of parallel marshalling."""
+    global _chunk_dumps
+    if _chunk_dumps is None:
+        _chunk_dumps = load_json_backend('auto')
+
+    formats = [_portable_fields[name]().format for name in names]
+    items = [{key: None if value is None else format(value) for key, format, value in zip(keys, formats, row)}
+             for row in rows]
+    return _to_bytes(_chunk_dumps(items, {'ensure_ascii': False})).strip()[1:-1]
+
+
+def _get_sparse_definition(cache, fields_value, model, field_definition, nested, projection):
+    """Return `(serialize, load_options, projection)` for the fields chosen by the client."""
+    names = set(name.strip() for name in fields_value.split(',') if name.strip())
+    unknown = names - set(field_definition.keys())
+    if not names:
+        abort(400, message='no fields chosen')
+    if unknown:
+        abort(400, message='unknown fields: {}'.format(', '.join(sorted(unknown))))
+    return cache.get_or_create(tuple(sorted(names)), lambda: _make_sparse_definition(
+        names, model, field_definition, nested, projection))
+
+
+def _make_sparse_definition(names, model, field_definition, nested, projection):
+    serialize = _compile_serializer({key: field for key, field in field_definition.items() if key in names})
+    chosen_nested = {name: spec for name, spec in (nested or {}).items() if name in names}
+    load_options = _eager_load_options(model, chosen_nested) if chosen_nested else None
+    return serialize, load_options, projection or serialize.serialize_values is not None
+
+
+def _get_key_columns(model, sort_by):
+    """Return the columns to sort the rows by in keyset pagination, and whether the order is descending."""
+    primary_keys = inspect(model).primary_key
+    if len(primary_keys) != 1:
+        raise ValueError('pagination only support models have single primary key')
+
+    descending = False
+    if sort_by is None:
+        return [primary_keys[0]], descending
+
+    if sort_by.startswith('-'):
+        sort_by, descending = sort_by[1:], True
+    sort_column = model.__table__.columns[sort_by]
+    return [primary_keys[0]] if sort_column is primary_keys[0] else [sort_column, primary_keys[0]], descending
+
+
+def _paginate_query(query, model, serialize, projection, mode, per_page, key_columns, descending):
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(_seek_condition(key_columns, _decode_cursor(cursor, key_columns), descending))
+    query = query.order_by(None).order_by(*[col.desc() if descending else col.asc() for col in key_columns])
+    query = query.limit(per_page + 1)
+
+    row_serialize = serialize
+    if projection:
+        query, row_serialize = _project_query(query, model, serialize)
+    if row_serialize is not serialize:
+        # The query was rewritten by `with_entities()`, add the key columns at the end of the rows,
+        #  `serialize_values()` will ignore them.
+        query = query.add_columns(*[col.label('_cursor_{}'.format(i)) for i, col in enumerate(key_columns)])
+        key_attrs = ['_cursor_{}'.format(i) for i in range(len(key_columns))]
+    else:
+        mapper = inspect(model)
+        key_attrs = [mapper.get_property_by_column(col).key for col in key_columns]
+
+    rows = query.all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = _encode_cursor([getattr(rows[-1], attr) for attr in key_attrs])
+    items = [row_serialize(row) for row in rows]
+
+    if mode == 'envelope':
+        return dict(items=items, next_cursor=next_cursor)
+
+    headers = {}
+    if next_cursor is not None:
+        args = [(k, v) for k, v in request.args.items(True) if k != 'cursor'] + [('cursor', next_cursor)]
+        headers['Link'] = '<{}?{}>; rel="next"'.format(request.base_url, urlencode(args))
+    return items, 200, headers
+
+
+def _seek_condition(key_columns, values, descending):
+    """(col1, col2) > (value1, value2), written as `col1 > value1 OR (col1 = value1 AND col2 > value2)`"""
+    compare = operator.lt if descending else operator.gt
+    if len(key_columns) == 1:
+        return compare(key_columns[0], values[0])
+    return or_(compare(key_columns[0], values[0]),
+               and_(key_columns[0] == values[0], compare(key_columns[1], values[1])))
+
+
+def _encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, date) else
+              str(value) if isinstance(value, Decimal) else value
+              for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor, key_columns):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(str(cursor + '=' * (-len(cursor) % 4))).decode('utf-8'))
+        if not isinstance(values, list) or len(values) != len(key_columns):
+            raise ValueError(cursor)
+        return [_parse_cursor_value(value, col.type.python_type) for value, col in zip(values, key_columns)]
+    except (TypeError, ValueError):
+        abort(400, message='invalid cursor')
+
+
+def _parse_cursor_value(value, python_type):
+    if python_type is datetime:
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f' if '.' in value else '%Y-%m-%dT%H:%M:%S')
+    elif python_type is date:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    elif python_type in (Decimal, float) or python_type in six.integer_types:
+        return python_type(value)
+    return value
+
+
+def _read_attribute(key, field):
+    """Return the name of the object's attribute that the field reads, or None if it can't be found out."""
+    if isinstance(field, dict):
+        return None
+    attribute = key if field.attribute is None else field.attribute
+    return attribute.split('.')[0] if isinstance(attribute, six.string_types) else None
+
+
+def _compile_serializer(field_definition):
+    """Compile the field definition into a function, that transform an object to a plain dict.
+
+    Flask-RESTful's `marshal()` will instantiate every field, and call `field.output()` -> `fields.get_value()`
+     -> `field.format()` for every column of every row.
+    But for the columns that generated by `marshal_with_model` itself (the `_type_map` fields),
+     we know they are plain attributes of the object, so we fetch all of them by one `attrgetter` call,
+     and pass the values to `field.format()` directly.
+    Other fields (eg. fields in `extends`) are still handled by their `output()` method.
+
+    Objects that are dict, list or tuple will be handled by Flask-RESTful's `marshal()`,
+     because their values were fetched by key, not by attribute.
+
+    If all the fields can be compiled, the returned function also has a `serialize_values` attribute,
+     that accepts a sequence of values in the order of `fast_keys` (eg. a row tuple from `Query.with_entities()`).
+    `attributes` are the names of the attributes the fields read (the first part of a dotted `attribute`),
+     so `_project_query()` knows which columns must be loaded.
+    `serialize_row()` and `format_values()` are the same, but return lists in the order of `keys`,
+     they are used by the columnar layouts.
     """
-    @marshal_with_model(*args, **kwargs)
-    def fn(value):
-        return value
-    return fn
+    keys = list(field_definition.keys())
+    fast_fields = []        # [(key, format), ...]
+    other_fields = []       # [(key, field), ...]
+    portable_names = []     # the names of the fast fields in `_portable_fields`, see `_dump_chunk()`
+    for key, field in field_definition.items():
+        field_class = field if isinstance(field, type) else type(field)
+        if isinstance(field, type):
+            field = field()
+        if getattr(field, 'compilable', False) and field.attribute is None:
+            fast_fields.append((key, field.format))
+            portable_names.append(_portable_field_names.get(field_class))
+        else:
+            other_fields.append((key, field))
+
+    fast_keys = [key for key, _ in fast_fields]
+    attributes = fast_keys + [_read_attribute(key, field) for key, field in other_fields]
+    if not fast_keys:
+        getter = None
+    elif len(fast_keys) == 1:
+        single_getter = attrgetter(fast_keys[0])
+        getter = lambda obj: (single_getter(obj),)
+    else:
+        getter = attrgetter(*fast_keys)
+
+    def serialize(obj):
+        if isinstance(obj, (Mapping, list, tuple)):
+            return _marshal(obj, field_definition)
+
+        data = serialize_values(get_values(obj))
+        if other_fields:
+            for key, field in other_fields:
+                data[key] = _marshal(obj, field) if isinstance(field, dict) else field.output(key, obj)
+            # keep the key order same as the field definition
+            data = {key: data[key] for key in keys}
+        return data
+
+    def get_values(obj):
+        try:
+            return getter(obj) if fast_keys else ()
+        except AttributeError:
+            return [getattr(obj, key, None) for key in fast_keys]
+
+    def serialize_row(obj):
+        """Return the values of the fields as a list, in the order of `keys`."""
+        if other_fields or isinstance(obj, (Mapping, list, tuple)):
+            data = serialize(obj)
+            return [data[key] for key in keys]
+        return format_values(get_values(obj))
+
+    def format_values(values):
+        return [None if value is None else format(value) for (_, format), value in zip(fast_fields, values)]
+
+    def serialize_values(values):
+        return {key: None if value is None else format(value)
+                for (key, format), value in zip(fast_fields, values)}
+
+    serialize.keys = keys
+    serialize.attributes = [name for name in attributes if name is not None]
+    serialize.fast_keys = fast_keys
+    serialize.get_values = get_values
+    serialize.serialize_row = serialize_row
+    serialize.format_values = None if other_fields else format_values
+    serialize.serialize_values = None if other_fields else serialize_values
+    serialize.portable_names = None if other_fields or None in portable_names else portable_names
+    return serialize
 
 
 def _wrap_field(field):
     """Improve Flask-RESTFul's original field type"""
     class WrappedField(field):
+        # The output of this field can be compiled by `_compile_serializer()`
+        compilable = True
+
         def output(self, key, obj):
             value = _fields.get_value(key if self.attribute is None else self.attribute, obj)
 
@@ -97,6 +618,20 @@ def _wrap_field(field):
     return WrappedField
 
 
+class _RelationshipField(_fields.Raw):
+    """Output the related instance(s) by the serializer of the related model."""
+    def __init__(self, serialize, uselist):
+        super(_RelationshipField, self).__init__()
+        self.serialize = serialize
+        self.uselist = uselist
+
+    def output(self, key, obj):
+        value = _fields.get_value(key, obj)
+        if value is None:
+            return None
+        return [self.serialize(item) for item in value] if self.uselist else self.serialize(value)
+
+
 class _DateTimeField(_fields.Raw):
     """Transform `datetime` and `date` objects to timestamp before return it."""
     def format(self, value):
@@ -114,6 +649,46 @@ class _DateTimeField(_fields.Raw):
             raise _fields.MarshallingException(ae)
 
 
+_epoch = datetime(1970, 1, 1)
+_epoch_ordinal = _epoch.toordinal()
+
+
+class _EpochField(_fields.Raw):
+    """Transform `datetime` and `date` objects to UTC timestamp in seconds.
+    Naive datetime objects are treated as UTC."""
+    def format(self, value):
+        if isinstance(value, datetime):
+            offset = value.utcoffset()
+            if offset is not None:
+                value = value.replace(tzinfo=None) - offset
+            return (value - _epoch).total_seconds()
+        elif isinstance(value, date):
+            return float((value.toordinal() - _epoch_ordinal) * 86400)
+        raise _fields.MarshallingException('{!r} is not a datetime or date'.format(value))
+
+
+class _EpochMillisField(_fields.Raw):
+    """Transform `datetime` and `date` objects to UTC timestamp in milliseconds."""
+    def format(self, value):
+        if isinstance(value, datetime):
+            offset = value.utcoffset()
+            if offset is not None:
+                value = value.replace(tzinfo=None) - offset
+            delta = value - _epoch
+            return (delta.days * 86400 + delta.seconds) * 1000 + delta.microseconds // 1000
+        elif isinstance(value, date):
+            return (value.toordinal() - _epoch_ordinal) * 86400000
+        raise _fields.MarshallingException('{!r} is not a datetime or date'.format(value))
+
+
+class _ISOFormatField(_fields.Raw):
+    def format(self, value):
+        try:
+            return value.isoformat()
+        except AttributeError as ae:
+            raise _fields.MarshallingException(ae)
+
+
 class _FloatField(_fields.Raw):
     """Flask-RESTful will transform float value to a string before return it.
     This is not useful in most situation, so we change it to return float value directly"""
@@ -134,3 +709,15 @@ _type_map = {
     'datetime': _wrap_field(_DateTimeField),
     'date': _wrap_field(_DateTimeField)
 }
+
+_datetime_fields = {
+    # datetime_format: flask-restful field
+    'timestamp': _type_map['datetime'],
+    'epoch': _wrap_field(_EpochField),
+    'epoch_ms': _wrap_field(_EpochMillisField),
+    'iso': _wrap_field(_ISOFormatField),
+}
+
+# The fields that can be rebuilt in other processes by name, for parallel marshalling
+_portable_fields = dict(_type_map, **{'datetime_' + name: field for name, field in _datetime_fields.items()})
+_portable_field_names = {field: name for name, field in _portable_fields.items()}
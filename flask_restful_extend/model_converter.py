@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
 from werkzeug.routing import BaseConverter
 from werkzeug.exceptions import NotFound
+from flask import request, has_request_context
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from .cache import subscribe_modifications
+from . import timing
 
 
-def register_model_converter(model, app):
+def register_model_converter(model, app, cache=None, defer=False):
     """Add url converter for model
 
     Example:
@@ -19,21 +25,206 @@ def register_model_converter(model, app):
 
     This only support model's have single primary key.
     You need call this function before create view function.
+
+    The instances were cached in the scope of request, so if one request resolve the same instance multiple times,
+    only the first time will query the database.
+
+    If you want cache the instances across requests, pass a `KeyedCache` instance as `cache` parameter,
+     eg. `register_model_converter(Student, app, cache=KeyedCache(maxsize=1000, ttl=60))`.
+    The instances are cached by `(model, primary key)`, the id from url is converted to the type of the primary key
+     first (so `/1` and `/01` share the same item), and one cache can be shared by multiple models.
+    The cache stores detached copies of the instances, a cached instance will be merged into the current session
+     by `session.merge(load=False)` without querying the database.
+    When an instance was updated or deleted by any session, it will be evicted from the cache automatically
+     after the session flushed and committed. You can also evict it manually by `invalidate_model_cache()`.
+
+    If a route contains multiple model converters, eg. `/<School:school>/<Klass:klass>/<Student:student>`,
+     every converter will query the database separately.
+    Set `defer=True`, then the converter won't load the instance when matching the url,
+     all deferred instances of the request will be loaded together before the view function runs,
+     instances of the same model will be loaded by one `IN` query.
     """
     if hasattr(model, 'id'):
         class Converter(_ModelConverter):
             _model = model
+            _cache = cache
+            _defer = defer
         app.url_map.converters[model.__name__] = Converter
 
+        if cache is not None:
+            _model_caches[model] = cache
+            subscribe_modifications(_evict_modified_instances)
+
+        if defer and not app.extensions.get('restful_extend_deferred_converter'):
+            app.extensions['restful_extend_deferred_converter'] = True
+            app.before_request(_resolve_deferred_instances)
+
+
+def invalidate_model_cache(model, inst_id=None):
+    """Evict the cached instance of the model from the cross requests cache,
+    if `inst_id` is None, evict all cached instances of the model."""
+    cache = _model_caches.get(model)
+    if cache is None:
+        return
+    if inst_id is None:
+        for key in cache.keys():
+            if isinstance(key, tuple) and key[0] is model:
+                cache.pop(key)
+    else:
+        key = _cache_key(model, inst_id)
+        if key is not None:
+            cache.pop(key)
+
 
 class _ModelConverter(BaseConverter):
     _model = None
+    _cache = None
+    _defer = False
+    # the deferred instances of async converters are loaded by `async_support._resolve_deferred_instances_async()`
+    _async = False
 
     def to_python(self, inst_id):
-        instance = self._model.query.get(inst_id)
-        if instance is None:
-            raise NotFound(u'{}(id={}) not exists，request invalid'.format(self._model.__name__, inst_id))
-        return instance
+        if self._defer:
+            return _DeferredInstance(type(self), inst_id)
+        with timing.measure('converter'):
+            return self.load_instances([inst_id])[inst_id]
 
     def to_url(self, inst):
         return str(inst.id)
+
+    @classmethod
+    def load_instances(cls, inst_ids):
+        """Load the instances of the given ids, return a dict: {inst_id: instance}.
+        Instances not in the cache will be loaded by one query. If some instance not exists, raise `NotFound`."""
+        request_cache = _get_request_cache()
+        instances = {}
+        missing_ids = []
+        for inst_id in inst_ids:
+            instance = request_cache.get((cls._model, inst_id))
+            cache_key = None if cls._cache is None else _cache_key(cls._model, inst_id)
+            if instance is None and cache_key is not None:
+                cached = cls._cache.get(cache_key)
+                if cached is not None:
+                    instance = request_cache[(cls._model, inst_id)] = \
+                        cls._model.query.session.merge(cached, load=False)
+
+            if instance is None:
+                missing_ids.append(inst_id)
+            else:
+                instances[inst_id] = instance
+
+        if missing_ids:
+            loaded = cls._query_instances(missing_ids)
+            for inst_id in missing_ids:
+                instance = loaded.get(inst_id)
+                if instance is None:
+                    raise NotFound(u'{}(id={}) not exists，request invalid'.format(cls._model.__name__, inst_id))
+
+                instances[inst_id] = request_cache[(cls._model, inst_id)] = instance
+                cache_key = None if cls._cache is None else _cache_key(cls._model, inst_id)
+                if cache_key is not None:
+                    cls._cache.set(cache_key, _detached_copy(instance))
+
+        return instances
+
+    @classmethod
+    def _query_instances(cls, inst_ids):
+        if len(inst_ids) == 1:
+            instance = cls._model.query.get(inst_ids[0])
+            return {} if instance is None else {inst_ids[0]: instance}
+
+        coerced_ids = _coerce_ids(cls._model, inst_ids)
+        if not coerced_ids:
+            return {}
+        query = cls._model.query.filter(cls._model.id.in_(list(coerced_ids.keys())))
+        return {coerced_ids[instance.id]: instance for instance in query}
+
+
+class _DeferredInstance(object):
+    """The placeholder of the instance to be loaded by `_resolve_deferred_instances()`."""
+    def __init__(self, converter, inst_id):
+        self.converter = converter
+        self.inst_id = inst_id
+
+
+def _resolve_deferred_instances():
+    view_args = request.view_args
+    if not view_args:
+        return
+
+    deferred = {
+        # converter: [(arg_name, inst_id), ...]
+    }
+    for name, value in view_args.items():
+        if isinstance(value, _DeferredInstance) and not value.converter._async:
+            deferred.setdefault(value.converter, []).append((name, value.inst_id))
+
+    with timing.measure('converter'):
+        for converter, items in deferred.items():
+            instances = converter.load_instances([inst_id for _, inst_id in items])
+            for name, inst_id in items:
+                view_args[name] = instances[inst_id]
+
+
+def _coerce_ids(model, inst_ids):
+    """The ids from url are strings, convert them to the type of the primary key,
+    so we can find out which instance the id corresponds to. Return {coerced_id: inst_id}"""
+    python_type = _get_id_type(model)
+    coerced_ids = {}
+    for inst_id in inst_ids:
+        try:
+            coerced_ids[python_type(inst_id)] = inst_id
+        except (TypeError, ValueError):
+            pass
+    return coerced_ids
+
+
+def _cache_key(model, inst_id):
+    """The key of the instance in the cross requests cache: (model, primary key).
+    Return None if the id can't be converted to the type of the primary key."""
+    try:
+        return model, _get_id_type(model)(inst_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_id_type(model):
+    try:
+        return inspect(model).get_property('id').columns[0].type.python_type
+    except NotImplementedError:
+        return lambda value: value
+
+
+def _get_request_cache():
+    if not has_request_context():
+        return {}
+    try:
+        return request._model_converter_cache
+    except AttributeError:
+        cache = request._model_converter_cache = {}
+        return cache
+
+
+def _detached_copy(instance):
+    """Make a detached copy of the instance, with all its column attributes loaded.
+    The original instance will be expired or modified by its session, but the copy won't."""
+    mapper = inspect(instance).mapper
+    copied = mapper.class_manager.new_instance()
+    for prop in mapper.column_attrs:
+        set_committed_value(copied, prop.key, getattr(instance, prop.key))
+    make_transient_to_detached(copied)
+    return copied
+
+
+# ===== evict the updated instances from the cross requests cache =====
+
+_model_caches = {
+    # model: KeyedCache
+}
+
+
+def _evict_modified_instances(modified):
+    for model, identity in modified:
+        cache = _model_caches.get(model)
+        if cache is not None and identity is not None:
+            cache.pop((model, identity[0]))
@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
-__all__ = ['fix_argument_convert', 'make_request_parser', 'populate_model']
-from flask_restful import reqparse
+__all__ = ['fix_argument_convert', 'make_request_parser', 'populate_model', 'populate_models']
+from flask_restful import reqparse, abort
 from flask import request
+from werkzeug.exceptions import HTTPException
 from . import reqparse_fixed_type as fixed_type
+from .cache import definition_cache, freeze_key
+from .model_validates import ModelInvalid, bulk_validate
+from . import timing
 import six
 
 
@@ -69,7 +73,7 @@ def populate_model(model_or_inst, excludes=None, only=None):
     """
     inst = model_or_inst if _is_inst(model_or_inst) else model_or_inst()
 
-    parser = make_request_parser(model_or_inst, excludes, only, for_populate=True)
+    parser = _get_request_parser(model_or_inst, excludes, only, for_populate=True)
     req_args = parser.parse_args()
 
     for key, value in req_args.items():
@@ -78,6 +82,79 @@ def populate_model(model_or_inst, excludes=None, only=None):
     return inst
 
 
+def populate_models(model, excludes=None, only=None, as_mappings=False):
+    """Bulk version of `populate_model()`.
+    The request data should be a JSON array, every item of it will be parsed by one shared `RequestPopulator`,
+     and populated into a new model instance.
+
+    If `as_mappings` is True, return plain dicts instead of model instances,
+     they can be passed to `session.bulk_insert_mappings()` or `session.bulk_update_mappings()`
+     (for update, you need include the primary key by `only` parameter).
+    Because the validators defined by `complex_validates` won't be triggered by these methods,
+     the dicts will be validated by `bulk_validate()`.
+
+    Return `(entities, errors)`.
+    `entities` is a list of the instances (or dicts) that successfully parsed, in the order of the request data.
+    `errors` is a dict: `{item_index: error_message}`, contains the items that can't be parsed or validated.
+    """
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        abort(400, message='request data must be a JSON array')
+
+    parser = _get_request_parser(model, excludes, only, for_populate=True)
+
+    parsed = []     # [(item_index, req_args), ...]
+    errors = {}
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[i] = 'item must be a JSON object'
+            continue
+        try:
+            parsed.append((i, parser.parse_dict(item)))
+        except HTTPException as e:
+            errors[i] = e.data.get('message') if isinstance(getattr(e, 'data', None), dict) else e.description
+
+    entities = []
+    if as_mappings:
+        mappings, validate_errors = bulk_validate(model, [dict(req_args) for _, req_args in parsed])
+        for j, ((i, _), mapping) in enumerate(zip(parsed, mappings)):
+            if j in validate_errors:
+                errors[i] = u'; '.join(six.text_type(e) for e in validate_errors[j])
+            else:
+                entities.append(mapping)
+    else:
+        for i, req_args in parsed:
+            try:
+                inst = model()
+                for key, value in req_args.items():
+                    setattr(inst, key, value)
+            except ModelInvalid as e:
+                errors[i] = six.text_type(e)
+            else:
+                entities.append(inst)
+
+    return entities, errors
+
+
+class _ItemRequest(object):
+    """Act as a request that only contains one item of the JSON array, so parsers can parse it."""
+    values = None
+
+    def __init__(self, item):
+        self.json = item
+        self.unparsed_arguments = {}
+
+
+def _get_request_parser(model_or_inst, excludes=None, only=None, for_populate=False):
+    """Like `make_request_parser()`, but the parser will be cached by `definition_cache`.
+    The returned parser is shared by all the requests, so don't modify it."""
+    is_inst = _is_inst(model_or_inst)
+    key = ('parser', type(model_or_inst) if is_inst else model_or_inst, is_inst,
+           freeze_key(excludes), freeze_key(only), for_populate)
+    return definition_cache.get_or_create(
+        key, lambda: make_request_parser(model_or_inst, excludes, only, for_populate))
+
+
 def _is_inst(model_or_inst):
     return hasattr(model_or_inst, '_sa_instance_state')
 
@@ -102,14 +179,33 @@ class RequestPopulator(reqparse.RequestParser):
     def parse_args(self, req=None):
         if req is None:
             req = request
+        with timing.measure('reqparse'):
+            return self._parse(req, _get_json_body(req))
+
+    def parse_dict(self, data):
+        """Parse arguments from a dict (eg. an item of a JSON array), as if it was the JSON body of the request."""
+        with timing.measure('reqparse'):
+            return self._parse(_ItemRequest(data), data)
 
+    def _parse(self, req, json_data):
+        """If `json_data` is not None, the arguments that support it will be parsed by `PopulatorArgument.parse_json()`,
+        it reads the values from `json_data` directly, instead of going through Flask-RESTful's `Argument.parse()`."""
         req.unparsed_arguments = {}
 
         namespace = self.namespace_class()
 
         for arg in self.args:
             try:
-                value = arg.parse(req)
+                if json_data is not None and arg.json_fast_path:
+                    try:
+                        value = arg.parse_json(json_data)
+                    except ArgumentNoValue:
+                        if not arg.required:
+                            raise
+                        # let Flask-RESTful report the "missing required parameter" error
+                        value = arg.parse(req)
+                else:
+                    value = arg.parse(req)
                 namespace[arg.dest or arg.name] = value
             except ArgumentNoValue:
                 pass
@@ -117,6 +213,15 @@ class RequestPopulator(reqparse.RequestParser):
         return namespace
 
 
+def _get_json_body(req):
+    """Return the JSON body of the request, if the arguments can only come from it.
+    (If there are query string or form data, arguments should be parsed by the normal way, to merge the values.)"""
+    if not req.is_json or req.values:
+        return None
+    data = req.get_json(silent=True)
+    return data if isinstance(data, dict) else None
+
+
 class PopulatorArgument(reqparse.Argument):
     """Argument type that created specifically for populate operation.
     When the argument is not assigned, it will raise an exception rather than applying default value.
@@ -148,6 +253,47 @@ class PopulatorArgument(reqparse.Argument):
 
         super(PopulatorArgument, self).__init__(*args, **kwargs)
 
+        # Whether this argument can be parsed by `parse_json()`.
+        # Only the arguments use default settings are supported,
+        #  and the type must be a converter that only accept one argument (eg. the types from `_type_dict`).
+        self.json_fast_path = (
+            self.location in (('json', 'values'), ('json',), 'json') and list(self.operators) == ['=']
+            and not self.choices and not self.trim and self.case_sensitive and not self.ignore
+            and self.type in _single_arg_types)
+
+    def parse_json(self, data):
+        """The fast path of `parse()`, for the request that only has JSON body.
+        Read the value from the decoded JSON dict directly, and convert it by `self.type`.
+        Follow the same rules as `parse()`:
+        if the argument is not assigned (or assigned with an empty array), raise `ArgumentNoValue`;
+        if the value is an array, it is treated as multiple values of the argument;
+        null values are not converted."""
+        try:
+            value = data[self.name]
+        except KeyError:
+            raise ArgumentNoValue()
+
+        values = value if isinstance(value, list) else [value]
+        if not values:
+            raise ArgumentNoValue()
+
+        results = []
+        for value in values:
+            if value is None:
+                if not self.nullable:
+                    self.handle_validation_error(ValueError('Must not be null!'), False)
+                results.append(None)
+                continue
+            try:
+                results.append(self.type(value))
+            except Exception as error:
+                self.handle_validation_error(error, False)
+
+        if self.real_action == 'store' or (self.real_action != 'append' and len(results) == 1):
+            return results[0]
+        else:
+            return results
+
     def parse(self, req):
         results = super(PopulatorArgument, self).parse(req)[0]
 
@@ -165,3 +311,6 @@ class PopulatorArgument(reqparse.Argument):
 
 class ArgumentNoValue(Exception):
     pass
+
+
+_single_arg_types = set(_type_dict.values()) | {reqparse.text_type, six.text_type, str, int, float, bool}
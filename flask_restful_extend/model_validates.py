@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 """Simplify and extend SQLAlchemy's attribute validates process"""
 
-__all__ = ['complex_validates']
+__all__ = ['complex_validates', 'bulk_validate']
 
+from sqlalchemy import inspect
 from sqlalchemy.orm import validates
+from . import timing
 import re
 
 
@@ -121,8 +123,117 @@ def complex_validates(validate_rule):
             ref_dict[column_name] = \
                 ref_dict.get(column_name, tuple()) + _normalize_predicate_refs(predicate_refs)
 
-    return validates(*ref_dict.keys())(
-        lambda self, name, value: _validate_handler(name, value, ref_dict[name]))
+    # Resolve predicates and build the validate handlers when the model is defined,
+    #  so assignments only pay for the actual checks.
+    handlers = {column_name: _make_validate_handler(column_name, predicate_refs)
+                for column_name, predicate_refs in ref_dict.items()}
+
+    def validate(self, name, value):
+        if timing.enabled:
+            with timing.measure('validate'):
+                return handlers[name](value)
+        return handlers[name](value)
+
+    validator = validates(*ref_dict.keys())(validate)
+    # `bulk_validate()` reads the rule from here
+    validator.validate_rule = ref_dict
+    return validator
+
+
+def bulk_validate(model, rows):
+    """Validate (and transform) a batch of rows by the rules that defined by `complex_validates` in the model,
+    without creating model instances.
+    This is useful when you insert rows by `session.bulk_insert_mappings()` or SQLAlchemy Core,
+    in these situation the validators won't be triggered.
+
+    `rows` can be a list of dict (`[{column_name: value, ...}, ...]`),
+     or a dict of columns (`{column_name: [value1, value2, ...], ...}`).
+
+    Return `(validated_rows, errors)`.
+    `validated_rows` is in the same format as `rows`, with the values transformed by the predicates
+     (`rows` itself won't be modified).
+    `errors` is a dict: `{row_index: [ModelInvalid, ...]}`, for every invalid row,
+     there's a `ModelInvalid` for each invalid column.
+    Invalid rows are still in `validated_rows`, you can filter them out by:
+
+        valid_rows = [row for i, row in enumerate(validated_rows) if i not in errors]
+
+    The validation was done column by column, the predefined predicates (min, max, min_length, max_length, match)
+    check the whole column in one loop.
+    As `complex_validates`, None values (and the columns not in a row) are not validated.
+    """
+    with timing.measure('validate'):
+        return _bulk_validate(model, rows)
+
+
+def _bulk_validate(model, rows):
+    column_oriented = isinstance(rows, dict)
+    if column_oriented:
+        validated_rows = {column_name: list(values) for column_name, values in rows.items()}
+    else:
+        validated_rows = [dict(row) for row in rows]
+
+    errors = {}
+    for column_name, predicate_refs in _get_validate_rules(model).items():
+        if column_oriented:
+            if column_name not in validated_rows:
+                continue
+            column = validated_rows[column_name]
+            indexes = [i for i, value in enumerate(column) if value is not None]
+            values = [column[i] for i in indexes]
+        else:
+            indexes = [i for i, row in enumerate(validated_rows) if row.get(column_name) is not None]
+            values = [validated_rows[i][column_name] for i in indexes]
+
+        checks = [_compile_predicate_ref(predicate_ref, vectorize=True) for predicate_ref in predicate_refs]
+        indexes, values = _validate_column(column_name, indexes, values, checks, errors)
+
+        for i, value in zip(indexes, values):
+            if column_oriented:
+                column[i] = value
+            else:
+                validated_rows[i][column_name] = value
+
+    return validated_rows, errors
+
+
+def _get_validate_rules(model):
+    """Collect the rules defined by `complex_validates` in the model: {column_name: predicate_refs}"""
+    rules = {}
+    for column_name, (method, _) in inspect(model).validators.items():
+        validate_rule = getattr(method, 'validate_rule', None)
+        if validate_rule is not None and column_name in validate_rule:
+            rules[column_name] = validate_rule[column_name]
+    return rules
+
+
+def _validate_column(column_name, indexes, values, checks, errors):
+    """Apply checks to all values of the column, add errors to `errors`.
+    Return the indexes and the (transformed) values that passed the validation."""
+    for check, predicate_name, predicate_args in checks:
+        results = check(values)
+
+        passed_indexes = []
+        passed_values = []
+        for i, value, validate_result in zip(indexes, values, results):
+            if validate_result is True:
+                pass
+            elif isinstance(validate_result, dict) and 'value' in validate_result:
+                value = validate_result['value']
+            elif type(validate_result) != bool:
+                raise Exception(
+                    'predicate (name={}) can only return bool or dict(value=new_value) value'.format(predicate_name))
+            else:
+                errors.setdefault(i, []).append(ModelInvalid(
+                    u'db model validate failed: column={}, value={}, predicate={}, arguments={}'.format(
+                        column_name, value, predicate_name, ','.join(map(str, predicate_args)))))
+                continue
+
+            passed_indexes.append(i)
+            passed_values.append(value)
+        indexes, values = passed_indexes, passed_values
+
+    return indexes, values
 
 
 def _to_tuple(value):
@@ -140,26 +251,83 @@ def _normalize_predicate_refs(predicate_refs):
     return tuple(_to_tuple(predicate_ref) for predicate_ref in _to_tuple(predicate_refs))
 
 
-def _validate_handler(column_name, value, predicate_refs):
-    """handle predicate's return value"""
+def _make_validate_handler(column_name, predicate_refs):
+    """Build the function that validates the values of the column, and handle predicate's return value"""
+    checks = [_compile_predicate_ref(predicate_ref) for predicate_ref in predicate_refs]
+
+    def handler(value):
+        # only does validate when attribute value is not None
+        # else, just return it, let sqlalchemy decide if the value was legal according to `nullable` argument's value
+        if value is not None:
+            for check, predicate_name, predicate_args in checks:
+                validate_result = check(value)
+                if validate_result is True:
+                    continue
+
+                if isinstance(validate_result, dict) and 'value' in validate_result:
+                    value = validate_result['value']
+                elif type(validate_result) != bool:
+                    raise Exception(
+                        'predicate (name={}) can only return bool or dict(value=new_value) value'.format(
+                            predicate_name))
+                else:
+                    raise ModelInvalid(
+                        u'db model validate failed: column={}, value={}, predicate={}, arguments={}'.format(
+                            column_name, value, predicate_name, ','.join(map(str, predicate_args))))
+        return value
+    return handler
+
+
+# Build the check function of predefined predicates, with the arguments bound (and regex pattern pre-compiled).
+_predicate_builders = {
+    'min': lambda min_val: lambda value: value >= min_val,
+    'max': lambda max_val: lambda value: value <= max_val,
+    'min_length': lambda min_val: lambda value: len(value) >= min_val,
+    'max_length': lambda max_val: lambda value: len(value) <= max_val,
+    'match': lambda pattern: _build_match(re.compile(pattern)),
+}
 
-    # only does validate when attribute value is not None
-    # else, just return it, let sqlalchemy decide if the value was legal according to `nullable` argument's value
-    if value is not None:
-        for predicate_ref in predicate_refs:
-            predicate, predicate_name, predicate_args = _decode_predicate_ref(predicate_ref)
-            validate_result = predicate(value, *predicate_args)
 
-            if isinstance(validate_result, dict) and 'value' in validate_result:
-                value = validate_result['value']
-            elif type(validate_result) != bool:
-                raise Exception(
-                    'predicate (name={}) can only return bool or dict(value=new_value) value'.format(predicate_name))
-            elif not validate_result:
-                raise ModelInvalid(u'db model validate failed: column={}, value={}, predicate={}, arguments={}'.format(
-                    column_name, value, predicate_name, ','.join(map(str, predicate_args))
-                ))
-    return value
+# Same as `_predicate_builders`, but the built functions check a list of values and return a list of results.
+_vectorized_predicate_builders = {
+    'min': lambda min_val: lambda values: [value >= min_val for value in values],
+    'max': lambda max_val: lambda values: [value <= max_val for value in values],
+    'min_length': lambda min_val: lambda values: [len(value) >= min_val for value in values],
+    'max_length': lambda max_val: lambda values: [len(value) <= max_val for value in values],
+    'match': lambda pattern: _build_vectorized_match(re.compile(pattern)),
+}
+
+
+def _build_match(compiled_pattern):
+    match = compiled_pattern.match
+    return lambda value: match(value) is not None
+
+
+def _build_vectorized_match(compiled_pattern):
+    match = compiled_pattern.match
+    return lambda values: [match(value) is not None for value in values]
+
+
+def _compile_predicate_ref(predicate_ref, vectorize=False):
+    """Return the check function that only accept the value to validate, with the predicate's name and arguments.
+    If `vectorize` is True, the check function accepts a list of values and returns a list of results."""
+    predicate, predicate_name, predicate_args = _decode_predicate_ref(predicate_ref)
+
+    builders = _vectorized_predicate_builders if vectorize else _predicate_builders
+    builder = builders.get(predicate_name)
+    if builder is not None and predicate is predefined_predicates.get(predicate_name):
+        check = builder(*predicate_args)
+    else:
+        if predicate_args:
+            check = lambda value: predicate(value, *predicate_args)
+        else:
+            check = predicate
+
+        if vectorize:
+            single_check = check
+            check = lambda values: [single_check(value) for value in values]
+
+    return check, predicate_name, predicate_args
 
 
 def _decode_predicate_ref(rule):
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Cache the dumped JSON of GET endpoints in the server side."""
+
+__all__ = ['ResponseCache', 'MappingBackend']
+
+from flask import request
+from sqlalchemy import inspect, Table
+from functools import wraps
+from .cache import KeyedCache, freeze_key, subscribe_modifications
+from .extend_json import RawJSON, _to_bytes, _vary_on
+import types
+import weakref
+import hashlib
+import pickle
+import uuid
+import time
+import six
+
+
+class ResponseCache(object):
+    """Usage:
+        api = Api(app)
+        enhance_json_encode(api)
+        cache = ResponseCache(api, maxsize=1000, ttl=600)
+
+        class Students(Resource):
+            @cache.cached()
+            @marshal_with_model(Student)
+            def get(self):
+                return Student.query
+
+    The view function's result will be dumped to JSON, and the dumped bytes are cached.
+    The cache key consists of the endpoint, the request path and query string, and the fields outputted by
+    `marshal_with_model`. If the result depends on other things (eg. the current user), pass a `vary` callback
+    to `cached()`, its return value will be added to the key.
+
+    The cached responses of an endpoint will be invalidated when the tables it depends on were modified.
+    The tables of the `marshal_with_model` model (and the models in its `nested` spec) are always watched,
+     you can specify more by `tables` parameter of `cached()` (models, `Table` objects or table names).
+    Modifications made by the ORM are detected automatically when the session was flushed and committed.
+    For the modifications that bypass the unit of work (eg. `Query.update()`, `session.bulk_insert_mappings()`,
+    SQLAlchemy Core), call `cache.invalidate(table)` manually.
+
+    `backend` can be a `KeyedCache` (this is the default, it uses `maxsize` and `ttl` parameters),
+    a `MappingBackend`, or any object that has the `get(key, default)`, `set(key, value)`, `pop(key)`
+    and `clear()` methods.
+
+    Only the requests that negotiated to JSON will be cached. If the view function returns a generator
+    (eg. `marshal_with_model(stream=True)`), or returns a `(data, code, headers)` tuple, it won't be cached.
+    Call `enhance_json_encode()` before creating the `ResponseCache`.
+    """
+    def __init__(self, api_instance, backend=None, maxsize=1000, ttl=None):
+        if getattr(api_instance, 'json_dumps', None) is None:
+            raise ValueError('call enhance_json_encode() on the API before creating ResponseCache')
+
+        self.api = api_instance
+        self.backend = KeyedCache(maxsize=maxsize, ttl=ttl) if backend is None else backend
+        _caches.add(self)
+        subscribe_modifications(_invalidate_modified_tables)
+
+    def cached(self, tables=None, vary=None):
+        def decorator(f):
+            watched = set(_table_name(table) for table in (tables or []))
+            watched.update(getattr(f, 'marshal_tables', ()))
+            if not watched:
+                raise ValueError('can\'t find out the tables the view function depends on, specify them by `tables`')
+            watched = tuple(sorted(watched))
+            fields = getattr(f, 'marshal_fields', None)
+            vary_headers = getattr(f, 'marshal_vary_headers', ())
+
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                if request.method not in ('GET', 'HEAD') or not self._accept_json():
+                    return f(*args, **kwargs)
+
+                if vary_headers:
+                    # the cached response won't call the view function, which adds the `Vary` header
+                    _vary_on(*vary_headers)
+                key = ('response', request.endpoint, request.path, freeze_key(sorted(request.args.items(True))),
+                       fields, tuple(request.headers.get(header) for header in vary_headers), vary() if vary else None)
+                versions = self._get_versions(watched)
+                entry = self.backend.get(key)
+                if entry is not None and entry[0] == versions:
+                    return RawJSON(entry[1])
+
+                result = f(*args, **kwargs)
+                if isinstance(result, (tuple, types.GeneratorType)):
+                    return result
+                dumped = _to_bytes(self.api.json_dumps(result))
+                self.backend.set(key, (versions, dumped))
+                return RawJSON(dumped)
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tables):
+        """Invalidate the cached responses that depend on these tables."""
+        for table in tables:
+            self.backend.set(('response_table_version', _table_name(table)), uuid.uuid4().hex)
+
+    def clear(self):
+        self.backend.clear()
+
+    def _get_versions(self, tables):
+        # The version of a table is a random token, so if it was evicted from the backend,
+        #  a new token will be generated, the cached responses won't match it.
+        versions = []
+        for table in tables:
+            version = self.backend.get(('response_table_version', table))
+            if version is None:
+                version = uuid.uuid4().hex
+                self.backend.set(('response_table_version', table), version)
+            versions.append(version)
+        return tuple(versions)
+
+    def _accept_json(self):
+        return request.accept_mimetypes.best_match(self.api.representations, 'application/json') == \
+            'application/json'
+
+
+def _table_name(table):
+    if isinstance(table, six.string_types):
+        return table
+    elif isinstance(table, Table):
+        return table.name
+    else:
+        return table.__table__.name
+
+
+class MappingBackend(object):
+    """Store the entries in a dict-like object as serialized bytes, with string keys,
+    like shared cache servers (memcached, redis...) do.
+
+    By default it uses a plain dict, it can be used as a stand-in of shared caches in development and tests,
+     so the code that only works with in-process caches (eg. unpicklable values) can be found out.
+    It also can store the entries into a `shelve` or `dbm` object, so multiple processes can share them,
+     or into the client of a shared cache, if it supports the dict interface.
+
+    Entries expire after `ttl` seconds, if it was given. There's no size limit.
+    """
+    def __init__(self, store=None, ttl=None, prefix='restful_extend:'):
+        self.store = {} if store is None else store
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key, default=None):
+        raw = self.store.get(self._make_key(key))
+        if raw is None:
+            return default
+
+        expire_time, value = pickle.loads(raw)
+        if expire_time is not None and expire_time <= time.time():
+            self.pop(key)
+            return default
+        return value
+
+    def set(self, key, value):
+        expire_time = None if self.ttl is None else time.time() + self.ttl
+        self.store[self._make_key(key)] = pickle.dumps((expire_time, value), pickle.HIGHEST_PROTOCOL)
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        self.store.pop(self._make_key(key), None)
+        return value
+
+    def clear(self):
+        for key in list(self.store.keys()):
+            if key.startswith(self.prefix):
+                del self.store[key]
+
+    def _make_key(self, key):
+        return self.prefix + hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+
+# ===== invalidate the cached responses when the tables were modified =====
+
+_caches = weakref.WeakSet()
+
+
+def _invalidate_modified_tables(modified):
+    if not _caches:
+        return
+    tables = set()
+    for model, _ in modified:
+        tables.update(table.name for table in inspect(model).tables)
+    for cache in list(_caches):
+        cache.invalidate(*tables)
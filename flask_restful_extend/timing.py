@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Record the time spent in the hot paths of flask-restful-extend, in every request.
+
+Enable it by `ErrorHandledApi.enable_timing()`, it only affects the app that the API was bound to.
+When no app has enabled it, `measure()` only checks a global flag, so the overhead is near zero.
+
+Recorded phases:
+    converter   load instances for model url converters
+    reqparse    parse request arguments by `RequestPopulator` (`populate_model()`, `populate_models()`)
+    validate    validate attributes by `complex_validates` and `bulk_validate()`
+    marshal     marshal the result of view function by `marshal_with_model`
+    json        encode the response by the JSON representation of `enhance_json_encode()`
+    jsonp       wrap the response by `support_jsonp()`
+    etag        hash the response body by `support_etag()`
+    compress    compress the response by `support_compression()`
+    msgpack     encode the response by the MessagePack representation of `enhance_binary_encode()`
+    cbor        encode the response by the CBOR representation of `enhance_binary_encode()`
+
+(In streaming mode, the rows are marshalled and encoded after the response headers were sent,
+ so that time can't be recorded.)
+"""
+
+__all__ = ['measure', 'get_timings', 'enabled']
+
+from flask import g, has_app_context, current_app
+from timeit import default_timer
+
+# Whether any app has enabled timing, the apps that enabled it are marked in `app.extensions`.
+enabled = False
+
+
+def enable(app):
+    global enabled
+    enabled = True
+    app.extensions['restful_extend_timing'] = True
+
+
+def measure(phase):
+    """Return a context manager, that records the time spent in it as the specified phase of current request.
+
+    Usage:
+        with timing.measure('marshal'):
+            do_something()
+    """
+    if not enabled or not has_app_context() or not current_app.extensions.get('restful_extend_timing'):
+        return _null_timer
+    return _Timer(get_timings(), phase)
+
+
+def get_timings():
+    """Return the timings of current request: {phase: seconds}"""
+    timings = getattr(g, '_restful_extend_timings', None)
+    if timings is None:
+        timings = g._restful_extend_timings = {}
+    return timings
+
+
+def format_server_timing(timings):
+    """Format the timings to the value of `Server-Timing` header."""
+    return ', '.join('{};dur={:.2f}'.format(phase, seconds * 1000) for phase, seconds in sorted(timings.items()))
+
+
+class _Timer(object):
+    __slots__ = ('timings', 'phase', 'start')
+
+    def __init__(self, timings, phase):
+        self.timings = timings
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = default_timer()
+
+    def __exit__(self, *args):
+        self.timings[self.phase] = self.timings.get(self.phase, 0) + default_timer() - self.start
+
+
+class _NullTimer(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+_null_timer = _NullTimer()
@@ -5,9 +5,12 @@ sys.path.insert(1, sys.path[0] + '/../')
 
 import unittest
 
-from .error_handle_test import ErrorHandleTestCase
-from .json_extend_test import JSONEncoderTestCase, JSONPTestCase
+from .error_handle_test import ErrorHandleTestCase, TimingTestCase
+from .json_extend_test import JSONEncoderTestCase, JSONBackendTestCase, JSONPTestCase, ETagAndCompressionTestCase, \
+    NDJSONTestCase, BinaryFormatTestCase
 from .model_test import ModelValidateTestCase, MarshalTestCase, ReqparseTestCase
+if sys.version_info >= (3, 7):
+    from .async_test import AsyncTestCase
 
 """
 from flask_restful import Resource
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from .my_test_case import MyTestCase, module_installed
+from flask_restful import Api
+from sqlalchemy import Column, Integer, String, ForeignKey, create_engine, select
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy.pool import NullPool
+import flask_restful_extend as restful_extend
+import unittest
+import tempfile
+import shutil
+import json
+import os
+
+
+@unittest.skipUnless(module_installed('asgiref') and module_installed('aiosqlite'),
+                     'asgiref or aiosqlite not installed')
+class AsyncTestCase(MyTestCase):
+    def setUp(self):
+        from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+        self.setup_app()
+        self.tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(self.tmp_dir, 'test.db')
+
+        Base = declarative_base()
+
+        class Klass(Base):
+            __tablename__ = 'klass'
+            id = Column(Integer, primary_key=True)
+            name = Column(String(100))
+
+        class Student(Base):
+            __tablename__ = 'student'
+            id = Column(Integer, primary_key=True)
+            name = Column(String(100))
+            klass_id = Column(Integer, ForeignKey(Klass.id))
+            klass = relationship(Klass)
+
+        engine = create_engine('sqlite:///' + db_path)
+        Base.metadata.create_all(engine)
+        session = sessionmaker(engine)()
+        klass = Klass(id=1, name='k')
+        session.add_all([Student(id=i, name='s{}'.format(i), klass=klass) for i in range(1, 6)])
+        session.commit()
+        session.close()
+        engine.dispose()
+
+        self.async_engine = create_async_engine('sqlite+aiosqlite:///' + db_path, poolclass=NullPool)
+        self.session_factory = sessionmaker(self.async_engine, class_=AsyncSession)
+        self.Student = Student
+        self.api = Api(self.app)
+        restful_extend.enhance_json_encode(self.api)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_marshal(self):
+        Student = self.Student
+
+        class Routes(restful_extend.AsyncResource):
+            @restful_extend.async_marshal_with_model(Student, self.session_factory, only=['id'],
+                                                     nested={'klass': dict(only=['name'])})
+            async def get(self):
+                return select(Student).where(Student.id < 3).order_by(Student.id)
+
+        class StreamRoutes(restful_extend.AsyncResource):
+            @restful_extend.async_marshal_with_model(Student, self.session_factory, only=['id'], stream=True,
+                                                     yield_per=2)
+            async def get(self):
+                return select(Student).order_by(Student.id)
+
+        self.api.add_resource(Routes, '/')
+        self.api.add_resource(StreamRoutes, '/stream')
+
+        self.assertEqual(json.loads(self.client.get('/').data),
+                         [dict(id=1, klass=dict(name='k')), dict(id=2, klass=dict(name='k'))])
+
+        rv = self.client.get('/stream')
+        self.assertTrue(rv.is_streamed)
+        self.assertEqual(json.loads(rv.data), [dict(id=i) for i in range(1, 6)])
+
+    def test_converter(self):
+        restful_extend.register_async_model_converter(self.Student, self.app, self.session_factory)
+
+        class Routes(restful_extend.AsyncResource):
+            async def get(self, student, student2):
+                return [student.name, student2.name]
+
+        self.api.add_resource(Routes, '/<Student:student>/<Student:student2>')
+
+        self.assertEqual(json.loads(self.client.get('/2/3').data), ['s2', 's3'])
+        self.assertEqual(self.client.get('/2/100').status_code, 404)
@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 from .my_test_case import MyTestCase
-from flask import json
+from flask import json, Flask
 from flask_restful import Resource
 import flask_restful_extend as restful_extend
+from flask_restful_extend import timing
 from werkzeug.exceptions import BadRequest, Unauthorized, HTTPException
 
 
@@ -84,3 +85,64 @@ class ErrorHandleTestCase(MyTestCase):
         """test has `ErrorHandledApi` disabled the unauthorized dialog"""
         self.verify(Unauthorized,
                     lambda rv: self.assertFalse(rv.headers.get('WWW-Authenticate', False)))
+
+
+class TimingTestCase(MyTestCase):
+    def setUp(self):
+        self.setup_app()
+
+        class Routes(Resource):
+            def get(self):
+                return dict(a=1)
+
+        self.api = restful_extend.ErrorHandledApi(self.app)
+        self.api.add_resource(Routes, '/')
+        restful_extend.enhance_json_encode(self.api)
+        restful_extend.support_jsonp(self.api)
+
+    def test_disabled(self):
+        rv = self.client.get('/?callback=cb')
+        self.assertNotIn('Server-Timing', rv.headers)
+
+    def test_server_timing(self):
+        records = []
+        self.api.enable_timing(callback=lambda timings, response: records.append(timings))
+
+        rv = self.client.get('/?callback=cb')
+        self.assertEqual(rv.status_code, 200)
+        phases = [item.split(';')[0] for item in rv.headers['Server-Timing'].split(', ')]
+        self.assertEqual(phases, ['json', 'jsonp'])
+        self.assertEqual(len(records), 1)
+        self.assertEqual(sorted(records[0].keys()), ['json', 'jsonp'])
+        self.assertTrue(all(seconds >= 0 for seconds in records[0].values()))
+
+    def test_without_header(self):
+        self.api.enable_timing(server_timing=False)
+        rv = self.client.get('/')
+        self.assertNotIn('Server-Timing', rv.headers)
+
+    def test_scoped_to_app(self):
+        self.api.enable_timing()
+
+        # other apps in the process are not affected
+        with Flask(__name__).test_request_context('/'):
+            with timing.measure('json'):
+                pass
+            self.assertEqual(timing.get_timings(), {})
+
+        self.assertIn('Server-Timing', self.client.get('/').headers)
+
+    def test_unbound_api(self):
+        # app factory pattern: the API is bound to the app later
+        class Routes(Resource):
+            def get(self):
+                return dict(a=1)
+
+        api = restful_extend.ErrorHandledApi()
+        restful_extend.enhance_json_encode(api)
+        api.add_resource(Routes, '/')
+        api.enable_timing()
+
+        app = Flask(__name__)
+        api.init_app(app)
+        self.assertEqual(app.test_client().get('/').headers['Server-Timing'].split(';')[0], 'json')
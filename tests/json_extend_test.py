@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
-from .my_test_case import MyTestCase
-from flask import request
+from .my_test_case import MyTestCase, module_installed
+from flask import request, Flask
 from flask_restful import Api, Resource
 import flask_restful_extend as restful_extend
 from datetime import datetime
 import time
 from decimal import Decimal
+import unittest
+import json
+import zlib
 
 
 class JSONEncoderTestCase(MyTestCase):
@@ -65,6 +68,54 @@ class JSONEncoderTestCase(MyTestCase):
         self.verify(CustomDataType(Decimal(10.5), 1), '11.5')
 
 
+class JSONBackendTestCase(MyTestCase):
+    def setUp(self):
+        self.setup_app()
+
+        testcase = self
+        testcase.json_data = None
+
+        class Routes(Resource):
+            def get(self):
+                return testcase.json_data
+
+        self.api = Api(self.app)
+        self.api.add_resource(Routes, '/')
+
+    def verify(self, data, expect_result):
+        self.json_data = data
+        rv = self.client.get('/')
+        self.assertEqual(rv.content_type, 'application/json')
+        self.assertEqual(json.loads(rv.data.decode("utf-8")), expect_result)
+
+    def verify_backend(self, backend):
+        restful_extend.enhance_json_encode(self.api, backend=backend)
+
+        class CustomDataType(object):
+            pass
+        self.api.json_encoder.register(lambda obj: 'custom', CustomDataType)
+
+        now = datetime.now()
+        self.verify(
+            [dict(a=1, b=u'你好', c=None, d=10.5), now, Decimal(10.5), CustomDataType(), (i for i in [1, 2])],
+            [dict(a=1, b=u'你好', c=None, d=10.5), time.mktime(now.timetuple()), 10.5, 'custom', [1, 2]])
+
+    def test_auto(self):
+        self.verify_backend('auto')
+
+    @unittest.skipUnless(module_installed('orjson'), 'orjson not installed')
+    def test_orjson(self):
+        self.verify_backend('orjson')
+
+    @unittest.skipUnless(module_installed('rapidjson'), 'rapidjson not installed')
+    def test_rapidjson(self):
+        self.verify_backend('rapidjson')
+
+    @unittest.skipUnless(module_installed('ujson'), 'ujson not installed')
+    def test_ujson(self):
+        self.verify_backend('ujson')
+
+
 class JSONPTestCase(MyTestCase):
 
     callback_arg_name = 'jsonp_callback'
@@ -100,4 +151,202 @@ class JSONPTestCase(MyTestCase):
         restful_extend.support_jsonp(self.api, lambda: request.args.get(self.callback_arg_name, False))
         self.verify()
 
+    def test_invalid_callback(self):
+        restful_extend.support_jsonp(self.api, self.callback_arg_name)
+        for callback in ['alert(1);cb', 'a b', '1cb', 'cb.', '<script>']:
+            rv = self.client.get('/', query_string={self.callback_arg_name: callback})
+            self.assertEqual(rv.status_code, 400)
+        rv = self.client.get('/', query_string={self.callback_arg_name: 'jQuery_1.$cb'})
+        self.assertEqual(rv.status_code, 200)
+
+    def test_content_length(self):
+        restful_extend.enhance_json_encode(self.api)
+        restful_extend.support_jsonp(self.api, self.callback_arg_name)
+        rv = self.client.get('/?{}={}'.format(self.callback_arg_name, self.js_callback))
+        self.assertEqual(rv.data.decode("utf-8"), '{}("{}")'.format(self.js_callback, self.return_data))
+        self.assertEqual(rv.content_length, len(rv.data))
+
+    def test_stream(self):
+        self.return_data = (i for i in range(3))
+        restful_extend.enhance_json_encode(self.api)
+        restful_extend.support_jsonp(self.api, self.callback_arg_name)
+        rv = self.client.get('/?{}={}'.format(self.callback_arg_name, self.js_callback))
+        self.assertEqual(rv.data.decode("utf-8"), '{}([0, 1, 2])'.format(self.js_callback))
+
+
+class ETagAndCompressionTestCase(MyTestCase):
+    def setUp(self):
+        self.setup_app()
+
+        testcase = self
+        testcase.return_data = [dict(id=i, name='student {}'.format(i)) for i in range(100)]
+
+        class Routes(Resource):
+            def get(self):
+                return testcase.return_data
+
+        self.api = Api(self.app)
+        self.api.add_resource(Routes, '/')
+        restful_extend.enhance_json_encode(self.api)
+
+    def test_etag(self):
+        restful_extend.support_etag(self.api)
+        rv = self.client.get('/')
+        self.assertEqual(rv.status_code, 200)
+        etag = rv.headers['ETag']
+
+        rv = self.client.get('/', headers={'If-None-Match': etag})
+        self.assertEqual(rv.status_code, 304)
+        self.assertEqual(rv.data, b'')
+
+        self.return_data = self.return_data[:10]
+        rv = self.client.get('/', headers={'If-None-Match': etag})
+        self.assertEqual(rv.status_code, 200)
+        self.assertNotEqual(rv.headers['ETag'], etag)
+
+    def test_version_etag(self):
+        testcase = self
+        testcase.version = 1
+        restful_extend.support_etag(self.api, lambda: testcase.version)
+        etag = self.client.get('/').headers['ETag']
+        self.assertNotEqual(self.client.get('/?page=2').headers['ETag'], etag)
+
+        self.return_data = None     # the data won't be encoded when the version matches
+        self.assertEqual(self.client.get('/', headers={'If-None-Match': etag}).status_code, 304)
+        self.version = 2
+        self.assertEqual(self.client.get('/', headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_compression(self):
+        restful_extend.support_etag(self.api)
+        restful_extend.support_compression(self.api, encodings=('gzip', 'deflate'))
+        plain = self.client.get('/')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(plain.headers['Vary'], 'Accept-Encoding')
+
+        rv = self.client.get('/', headers={'Accept-Encoding': 'deflate, gzip'})
+        self.assertEqual(rv.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(rv.content_length, len(rv.data))
+        self.assertEqual(zlib.decompress(rv.data, 16 + zlib.MAX_WBITS), plain.data)
+        self.assertEqual(rv.headers['ETag'], 'W/' + plain.headers['ETag'])
+
+        rv = self.client.get('/', headers={'Accept-Encoding': 'deflate', 'If-None-Match': rv.headers['ETag']})
+        self.assertEqual(rv.status_code, 304)
+
+        rv = self.client.get('/', headers={'Accept-Encoding': 'deflate'})
+        self.assertEqual(rv.headers['Content-Encoding'], 'deflate')
+        self.assertEqual(zlib.decompress(rv.data), plain.data)
+
+        self.return_data = self.return_data[:1]     # smaller than `min_size`
+        rv = self.client.get('/', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', rv.headers)
+
+    def test_stream_compression(self):
+        restful_extend.support_compression(self.api, encodings=('gzip',))
+        data = self.return_data
+        self.return_data = (item for item in data)
+        rv = self.client.get('/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(rv.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(zlib.decompress(rv.data, 16 + zlib.MAX_WBITS).decode('utf-8')), data)
+
+
+class NDJSONTestCase(MyTestCase):
+    def setUp(self):
+        self.setup_app()
+
+        testcase = self
+        testcase.return_data = [dict(id=1, name=u'学生'), dict(id=2, name='b\nc')]
+
+        class Routes(Resource):
+            def get(self):
+                return testcase.return_data
+
+        self.api = Api(self.app)
+        self.api.add_resource(Routes, '/')
+        restful_extend.enhance_json_encode(self.api)
+        restful_extend.support_jsonp(self.api)
+        restful_extend.support_ndjson(self.api)
+
+    def verify(self, rv, expect_lines):
+        self.assertEqual(rv.content_type, 'application/x-ndjson')
+        self.assertTrue(rv.is_streamed)
+        lines = rv.data.decode('utf-8').split('\n')
+        self.assertEqual(lines[-1], '')
+        self.assertEqual([json.loads(line) for line in lines[:-1]], expect_lines)
+
+    def test_accept_header(self):
+        self.verify(self.client.get('/', headers={'Accept': 'application/x-ndjson'}), self.return_data)
+        self.assertEqual(self.client.get('/').content_type, 'application/json')
+
+    def test_format_arg(self):
+        self.verify(self.client.get('/?format=ndjson'), self.return_data)
+        self.assertEqual(self.client.get('/?callback=cb').data.decode('utf-8')[:3], 'cb(')
+
+    def test_unbound_api(self):
+        # app factory pattern: the API is bound to the app later
+        testcase = self
+
+        class Routes(Resource):
+            def get(self):
+                return testcase.return_data
+
+        api = Api()
+        api.add_resource(Routes, '/')
+        restful_extend.enhance_json_encode(api)
+        restful_extend.support_ndjson(api)
+        restful_extend.enhance_binary_encode(api)
+
+        app = Flask(__name__)
+        api.init_app(app)
+        self.verify(app.test_client().get('/?format=ndjson'), self.return_data)
+
+    def test_generator_and_single_item(self):
+        self.app.debug = True       # lines are never indented
+        data = self.return_data
+        self.return_data = (item for item in data)
+        self.verify(self.client.get('/?format=ndjson'), data)
+
+        self.return_data = dict(message='abc')
+        self.verify(self.client.get('/?format=ndjson'), [dict(message='abc')])
+
+
+class BinaryFormatTestCase(MyTestCase):
+    def setUp(self):
+        self.setup_app()
+
+        testcase = self
+        testcase.return_data = [dict(id=1, name=u'学生', created_at=datetime(2014, 5, 13, 16, 53, 20),
+                                     balance=Decimal('1.5'), tags=('a', 'b'))]
+
+        class Routes(Resource):
+            def get(self):
+                return testcase.return_data
+
+        self.api = Api(self.app)
+        self.api.add_resource(Routes, '/')
+        restful_extend.enhance_json_encode(self.api)
+
+    def verify(self, format_name, mediatype, loads):
+        restful_extend.enhance_binary_encode(self.api, [format_name])
+        expect = json.loads(self.client.get('/').data.decode('utf-8'))
+
+        rv = self.client.get('/', headers={'Accept': mediatype})
+        self.assertEqual(rv.content_type, mediatype)
+        self.assertEqual(loads(rv.data), expect)
+
+        rv = self.client.get('/?format=' + format_name)
+        self.assertEqual(rv.content_type, mediatype)
+        self.assertEqual(loads(rv.data), expect)
+
+        data = self.return_data
+        self.return_data = (item for item in data)
+        self.assertEqual(loads(self.client.get('/?format=' + format_name).data), expect)
+
+    @unittest.skipUnless(module_installed('msgpack'), 'msgpack not installed')
+    def test_msgpack(self):
+        import msgpack
+        self.verify('msgpack', 'application/msgpack', lambda data: msgpack.unpackb(data, raw=False))
 
+    @unittest.skipUnless(module_installed('cbor2'), 'cbor2 not installed')
+    def test_cbor(self):
+        import cbor2
+        self.verify('cbor', 'application/cbor', cbor2.loads)
@@ -1,22 +1,27 @@
 # -*- coding: utf-8 -*-
 from .my_test_case import MyTestCase
-from sqlalchemy import Column, Integer, String, Float, Boolean, TIMESTAMP, text
+from sqlalchemy import Column, Integer, String, Float, Boolean, TIMESTAMP, ForeignKey, text, event
+from sqlalchemy.orm import relationship
 from flask_sqlalchemy import SQLAlchemy
-from flask_restful_extend.model_validates import complex_validates, ModelInvalid
+from flask_restful_extend.model_validates import complex_validates, bulk_validate, ModelInvalid
+import flask_restful_extend as restful_extend
 from flask_restful_extend import register_model_converter, marshal_with_model, quick_marshal
-from flask_restful_extend.model_reqparse import make_request_parser, populate_model, \
+from flask_restful_extend.model_reqparse import make_request_parser, populate_model, populate_models, \
     RequestPopulator, PopulatorArgument, ArgumentNoValue
 from flask_restful_extend.reqparse_fixed_type import *
+from flask_restful_extend.cache import definition_cache, KeyedCache
 from flask_restful import Api, Resource
 from flask_restful.reqparse import Argument
 from flask_restful import fields
-from flask import url_for, request
-from datetime import datetime
+from flask import Flask, url_for, request
+from werkzeug.exceptions import HTTPException
+from datetime import datetime, date, timedelta, tzinfo
 import time
 from copy import copy
 from copy import deepcopy
 import json
 import six
+import sys
 
 
 class ModelValidateTestCase(MyTestCase):
@@ -143,6 +148,47 @@ class ModelValidateTestCase(MyTestCase):
         for data in invalid_data:
             self.verify_exception(data)
 
+    def test_bulk_validate(self):
+        def trans_int(value):
+            return dict(value=value * 2)
+
+        self.setup_model({
+            'name': [('min_length', 5), ('max_length', 10), ('match', '^abc'), 'trans_upper'],
+            'notes': [('max_length', 5)],
+            'age': [trans_int, ('max', 20)]
+        })
+
+        rows = [
+            dict(name='abcdee', age=5, notes=None),
+            dict(name='abcd', age=11),              # too short, too old
+            dict(name='xabcde', notes='abc'),       # not match
+            dict(name=u'abc四五六'),
+            dict(notes='abcdef'),                   # too long
+        ]
+        validated_rows, errors = bulk_validate(self.Student, rows)
+
+        self.assertEqual(validated_rows, [
+            dict(name='ABCDEE', age=10, notes=None),
+            dict(name='abcd', age=11),     # invalid values are kept intact
+            dict(name='xabcde', notes='abc'),
+            dict(name=u'ABC四五六'),
+            dict(notes='abcdef'),
+        ])
+        # original rows were not modified
+        self.assertEqual(rows[0]['name'], 'abcdee')
+
+        self.assertEqual(sorted(errors.keys()), [1, 2, 4])
+        self.assertEqual(len(errors[1]), 2)
+        for row_errors in errors.values():
+            for error in row_errors:
+                self.assertIsInstance(error, ModelInvalid)
+                self.assertRegexpMatches(six.text_type(error), '^db model validate failed:')
+
+        # column oriented rows
+        validated_columns, errors = bulk_validate(self.Student, dict(name=['abcdee', 'abc', None], age=[1, 2, 3]))
+        self.assertEqual(validated_columns, dict(name=['ABCDEE', 'abc', None], age=[2, 4, 6]))
+        self.assertEqual(list(errors.keys()), [1])
+
 
 class _ModelTestCase(MyTestCase):
     def setUp(self):
@@ -207,7 +253,12 @@ class _ModelTestCase(MyTestCase):
 
         def __enter__(self, *args, **kwargs):
             ret = self.context.__enter__(*args, **kwargs)
-            request.unparsed_arguments = dict(Argument('').source(request))
+            try:
+                request.unparsed_arguments = dict(Argument('').source(request))
+            except Exception:
+                # don't leave the context pushed, otherwise it will affect other test cases
+                self.context.__exit__(*sys.exc_info())
+                raise
             return ret
 
         def __exit__(self, *args, **kwargs):
@@ -222,8 +273,8 @@ class MarshalTestCase(_ModelTestCase):
         super(MarshalTestCase, self).setUp()
         self.maxDiff = None
 
-    def verify_marshal(self, model_data, expect_result, excludes=None, only=None, extends=None):
-        @marshal_with_model(self.TestModel, excludes=excludes, only=only, extends=extends)
+    def verify_marshal(self, model_data, expect_result, excludes=None, only=None, extends=None, **kwargs):
+        @marshal_with_model(self.TestModel, excludes=excludes, only=only, extends=extends, **kwargs)
         def fn():
             return model_data
 
@@ -272,6 +323,383 @@ class MarshalTestCase(_ModelTestCase):
             self.result2
         )
 
+    def test_projection(self):
+        def marshal(query, **kwargs):
+            return quick_marshal(self.TestModel, projection=True, **kwargs)(query)
+
+        # query rewritten by `with_entities()`
+        self.assertEqual(marshal(self.TestModel.query), [self.result1, self.result2])
+        self.assertEqual(marshal(self.TestModel.query.filter_by(id=1), only=['id', 'col_timestamp']),
+                         [dict(id=1, col_timestamp=self.result1['col_timestamp'])])
+
+        # query rewritten by `load_only()`
+        statements = self.count_queries()
+        self.assertEqual(
+            marshal(self.TestModel.query.filter_by(id=1), only=['id'],
+                    extends={'extend_col': fields.String(attribute='col_str')}),
+            [dict(id=1, extend_col='a')])
+        self.assertEqual(len(statements), 1)
+
+        # the columns read by `extends` fields were loaded with the query, not lazy loaded row by row
+        del statements[:]
+        self.assertEqual(marshal(self.TestModel.query, only=['id', 'col_int'], extends={'col_int': fields.String}),
+                         [dict(id=1, col_int='10'), dict(id=2, col_int='10')])
+        self.assertEqual(len(statements), 1)
+
+    def test_marshal_plain_object(self):
+        class PlainObject(object):
+            pass
+
+        obj = PlainObject()
+        obj.__dict__.update(self.data2)
+        self.assertEqual(quick_marshal(self.TestModel, only=['id', 'col_int'])(obj), dict(id=2, col_int=10))
+
+        # values of dict were fetched by key
+        self.assertEqual(quick_marshal(self.TestModel, only=['id', 'col_int'])([self.data2]), [dict(id=2, col_int=10)])
+
+    def test_marshal_extends_only(self):
+        # no columns were chosen, only the extended fields were outputted
+        fn = quick_marshal(self.TestModel, only=['nope'], extends={'extra': fields.String(default='x')})
+        self.assertEqual(fn(self.TestModel.query.get(1)), dict(extra='x'))
+
+    def test_definition_cache(self):
+        definition_cache.clear()
+        stats = definition_cache.stats()
+
+        quick_marshal(self.TestModel, only=['id', 'col_int'])(self.TestModel.query.get(1))
+        quick_marshal(self.TestModel, only=['id', 'col_int'])(self.TestModel.query.get(2))
+        quick_marshal(self.TestModel, only='id')(self.TestModel.query.get(2))
+
+        new_stats = definition_cache.stats()
+        self.assertEqual(new_stats['hits'] - stats['hits'], 1)
+        self.assertEqual(new_stats['misses'] - stats['misses'], 2)
+        self.assertEqual(new_stats['size'], 2)
+
+        # definitions with unhashable parameters won't be cached
+        class UnhashableField(fields.Raw):
+            __hash__ = None
+        quick_marshal(self.TestModel, only='id', extends={'foo': UnhashableField()})(self.TestModel.query.get(2))
+        self.assertEqual(definition_cache.stats()['size'], 2)
+
+        # field instances are created in every call, definitions contain them won't be cached
+        for _ in range(50):
+            quick_marshal(self.TestModel, only='id', extends={'foo': fields.String()})(self.TestModel.query.get(2))
+        self.assertEqual(definition_cache.stats()['size'], 2)
+
+        # field classes can be cached
+        for _ in range(50):
+            quick_marshal(self.TestModel, only='id', extends={'foo': fields.String})(self.TestModel.query.get(2))
+        self.assertEqual(definition_cache.stats()['size'], 3)
+
+        self.assertEqual(definition_cache.maxsize, 1000)
+
+    def test_stream_marshal(self):
+        testcase = self
+
+        class Routes(Resource):
+            @marshal_with_model(testcase.TestModel, stream=True, yield_per=1)
+            def get(self):
+                return testcase.TestModel.query
+
+        api = Api(self.app)
+        api.add_resource(Routes, '/')
+        restful_extend.enhance_json_encode(api)
+
+        rv = self.client.get('/')
+        self.assertTrue(rv.is_streamed)
+        self.assertEqual(json.loads(rv.data.decode('utf-8')), [self.result1, self.result2])
+
+    def test_paginate(self):
+        for i in range(3, 8):
+            self.db.session.add(self.TestModel(id=i, col_int=10 - i, col_str=str(i), col_timestamp=datetime.now()))
+        self.db.session.commit()
+
+        testcase = self
+
+        class Routes(Resource):
+            @marshal_with_model(testcase.TestModel, only=['id'], paginate='envelope', per_page=3)
+            def get(self):
+                return testcase.TestModel.query
+
+        class SortedRoutes(Resource):
+            @marshal_with_model(testcase.TestModel, only=['id'], paginate='link', per_page=2, sort_by='-col_int',
+                                projection=True)
+            def get(self):
+                return testcase.TestModel.query
+
+        api = Api(self.app)
+        api.add_resource(Routes, '/')
+        api.add_resource(SortedRoutes, '/sorted')
+
+        data = json.loads(self.client.get('/').data)
+        self.assertEqual([item['id'] for item in data['items']], [1, 2, 3])
+        data = json.loads(self.client.get('/', query_string=dict(cursor=data['next_cursor'])).data)
+        self.assertEqual([item['id'] for item in data['items']], [4, 5, 6])
+        data = json.loads(self.client.get('/', query_string=dict(cursor=data['next_cursor'])).data)
+        self.assertEqual(data, dict(items=[dict(id=7)], next_cursor=None))
+
+        self.assertEqual(self.client.get('/?cursor=abc').status_code, 400)
+
+        # col_int: 1 -> 10, 2 -> 10, 3 -> 7, 4 -> 6 ..., the primary key is sorted in the same direction
+        ids = []
+        url = '/sorted?a=1'
+        while url:
+            rv = self.client.get(url)
+            ids += [item['id'] for item in json.loads(rv.data)]
+            link = rv.headers.get('Link')
+            url = link[link.index('/sorted'):link.index('>')] if link else None
+        self.assertEqual(ids, [2, 1, 3, 4, 5, 6, 7])
+
+    def test_nested(self):
+        db = self.db
+
+        class School(db.Model):
+            id = Column(Integer, primary_key=True)
+            name = Column(String(100))
+
+        class Klass(db.Model):
+            id = Column(Integer, primary_key=True)
+            name = Column(String(100))
+            school_id = Column(Integer, ForeignKey(School.id))
+            school = relationship(School)
+
+        class Pupil(db.Model):
+            id = Column(Integer, primary_key=True)
+            name = Column(String(100))
+            klass_id = Column(Integer, ForeignKey(Klass.id))
+            klass = relationship(Klass, backref='pupils')
+
+        db.create_all()
+        school = School(id=1, name='s')
+        for i in range(1, 4):
+            klass = Klass(id=i, name='k{}'.format(i), school=school)
+            db.session.add_all([Pupil(id=i * 10 + j, name='p', klass=klass) for j in range(2)])
+        db.session.commit()
+        db.session.remove()
+
+        fn = quick_marshal(Klass, only=['id'], nested={
+            'school': dict(only=['name']),
+            'pupils': dict(excludes=['klass_id', 'name']),
+        })
+        statements = self.count_queries()
+        result = fn(Klass.query.order_by(Klass.id))
+        self.assertEqual(result[0], dict(id=1, school=dict(name='s'), pupils=[dict(id=10), dict(id=11)]))
+        self.assertEqual(len(result), 3)
+        # one query for klasses (joined with school), one for pupils
+        self.assertEqual(len(statements), 2)
+
+        fn = quick_marshal(Pupil, only=['id'], nested={'klass': dict(only=['id'], load='selectin', nested={
+            'school': None,
+        })})
+        del statements[:]
+        result = fn(Pupil.query.order_by(Pupil.id))
+        self.assertEqual(result[0], dict(id=10, klass=dict(id=1, school=dict(id=1, name='s'))))
+        self.assertEqual(len(statements), 2)
+
+    def test_sparse_fields(self):
+        testcase = self
+
+        class Routes(Resource):
+            @marshal_with_model(testcase.TestModel, excludes=['col_int_null'], fields_arg='fields',
+                                extends={'extra': fields.String(attribute='col_str')})
+            def get(self):
+                return testcase.TestModel.query.order_by(testcase.TestModel.id)
+
+        api = Api(self.app)
+        api.add_resource(Routes, '/')
+
+        statements = self.count_queries()
+        self.assertEqual(json.loads(self.client.get('/?fields=id,col_int').data),
+                         [dict(id=1, col_int=10), dict(id=2, col_int=10)])
+        # only the chosen columns were selected
+        self.assertNotIn('col_str', statements[-1])
+
+        self.assertEqual(json.loads(self.client.get('/?fields=id, extra').data),
+                         [dict(id=1, extra='a'), dict(id=2, extra='a')])
+        # all fields: one column was excluded, one field was extended
+        self.assertEqual(len(json.loads(self.client.get('/').data)[0]), len(self.result1))
+
+        self.assertEqual(self.client.get('/?fields=id,col_int_null').status_code, 400)
+        self.assertEqual(self.client.get('/?fields=,').status_code, 400)
+
+    def test_datetime_format(self):
+        time_now = self.data1['col_timestamp']
+        epoch = (time_now - datetime(1970, 1, 1)).total_seconds()
+        result = quick_marshal(self.TestModel, only=['col_timestamp'], datetime_format='epoch')(
+            self.TestModel.query.get(1))
+        self.assertEqual(result, dict(col_timestamp=epoch))
+        result = quick_marshal(self.TestModel, only=['col_timestamp'], datetime_format='epoch_ms')(
+            self.TestModel.query.get(1))
+        self.assertEqual(result, dict(col_timestamp=int(epoch * 1000)))
+        result = quick_marshal(self.TestModel, only=['col_timestamp'], datetime_format='iso')(
+            self.TestModel.query.get(1))
+        self.assertEqual(result, dict(col_timestamp=time_now.isoformat()))
+
+        class UTC8(tzinfo):
+            def utcoffset(self, dt):
+                return timedelta(hours=8)
+
+        class PlainObject(object):
+            col_timestamp = datetime(1970, 1, 1, 8, 0, 1, 500000, tzinfo=UTC8())
+        fn = quick_marshal(self.TestModel, only=['col_timestamp'], datetime_format='epoch')
+        self.assertEqual(fn(PlainObject()), dict(col_timestamp=1.5))
+        PlainObject.col_timestamp = date(1970, 1, 2)
+        self.assertEqual(fn(PlainObject()), dict(col_timestamp=86400.0))
+        fn = quick_marshal(self.TestModel, only=['col_timestamp'], datetime_format='epoch_ms')
+        self.assertEqual(fn(PlainObject()), dict(col_timestamp=86400000))
+
+        with self.assertRaises(ValueError):
+            quick_marshal(self.TestModel, datetime_format='rfc')
+
+    def test_parallel(self):
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(2) as executor:
+            fn = quick_marshal(self.TestModel, parallel=executor, chunk_size=1)
+            for result in [self.TestModel.query.order_by(self.TestModel.id),
+                           self.TestModel.query.order_by(self.TestModel.id).all()]:
+                dumped = fn(result)
+                self.assertIsInstance(dumped, restful_extend.RawJSON)
+                self.assertEqual(json.loads(dumped.decode('utf-8')), [self.result1, self.result2])
+
+            fn = quick_marshal(self.TestModel, only=['id'], parallel=executor)
+            self.assertEqual(json.loads(fn([]).decode('utf-8')), [])
+            self.assertEqual(json.loads(fn(self.TestModel.query).decode('utf-8')), [dict(id=1), dict(id=2)])
+
+            with self.assertRaises(ValueError):
+                quick_marshal(self.TestModel, extends={'extra': fields.String}, parallel=executor)
+            with self.assertRaises(ValueError):
+                quick_marshal(self.TestModel, stream=True, parallel=executor)
+            with self.assertRaises(ValueError):
+                quick_marshal(self.TestModel, paginate='envelope', parallel=executor)
+
+    def test_layout(self):
+        api = Api(Flask(__name__))
+        testcase = self
+
+        class Routes(Resource):
+            @marshal_with_model(testcase.TestModel, only=['id', 'col_str'], layout_arg='layout')
+            def get(self):
+                return testcase.TestModel.query.order_by(testcase.TestModel.id)
+
+        class ProjectionRoutes(Resource):
+            @marshal_with_model(testcase.TestModel, only=['id', 'col_str'], projection=True, layout_arg='layout')
+            def get(self):
+                return testcase.TestModel.query.order_by(testcase.TestModel.id)
+
+        class ExtendsRoutes(Resource):
+            @marshal_with_model(testcase.TestModel, only=['id'], extends={'extra': fields.String(default='x')},
+                                layout_arg='layout')
+            def get(self):
+                return testcase.TestModel.query.order_by(testcase.TestModel.id).all()
+
+        api.add_resource(Routes, '/')
+        api.add_resource(ProjectionRoutes, '/projection')
+        api.add_resource(ExtendsRoutes, '/extends')
+        client = api.app.test_client()
+
+        objects = [dict(id=1, col_str='a'), dict(id=2, col_str='a')]
+        table = dict(columns=['id', 'col_str'], rows=[[1, 'a'], [2, 'a']])
+        columns = dict(id=[1, 2], col_str=['a', 'a'])
+        for url in ['/', '/projection']:
+            self.assertEqual(json.loads(client.get(url).data), objects)
+            self.assertEqual(json.loads(client.get(url + '?layout=objects').data), objects)
+            self.assertEqual(json.loads(client.get(url + '?layout=table').data), table)
+            self.assertEqual(json.loads(client.get(url + '?layout=columns').data), columns)
+            self.assertEqual(json.loads(client.get(url, headers={'X-Response-Layout': 'table'}).data), table)
+            self.assertEqual(client.get(url + '?layout=unknown').status_code, 400)
+
+        self.assertEqual(json.loads(client.get('/extends?layout=table').data),
+                         dict(columns=['id', 'extra'], rows=[[1, 'x'], [2, 'x']]))
+        self.assertEqual(json.loads(client.get('/extends?layout=columns').data), dict(id=[1, 2], extra=['x', 'x']))
+
+        fn = quick_marshal(self.TestModel, only=['id'], layout_arg='layout')
+        with api.app.test_request_context('/?layout=columns'):
+            self.assertEqual(fn([]), dict(id=[]))
+
+        for kwargs in [dict(paginate='envelope'), dict(stream=True), dict(parallel=object())]:
+            with self.assertRaises(ValueError):
+                quick_marshal(self.TestModel, only=['id'], layout_arg='layout', **kwargs)
+
+    def test_layout_vary(self):
+        testcase = self
+        api = Api(Flask(__name__))
+        restful_extend.enhance_json_encode(api)
+        restful_extend.support_etag(api, version_source=lambda: 1)
+        cache = restful_extend.ResponseCache(api)
+
+        class Routes(Resource):
+            @marshal_with_model(testcase.TestModel, only=['id'], layout_arg='layout')
+            def get(self):
+                return testcase.TestModel.query.order_by(testcase.TestModel.id)
+
+        class CachedRoutes(Resource):
+            @cache.cached()
+            @marshal_with_model(testcase.TestModel, only=['id'], layout_arg='layout')
+            def get(self):
+                return testcase.TestModel.query.order_by(testcase.TestModel.id)
+
+        api.add_resource(Routes, '/')
+        api.add_resource(CachedRoutes, '/cached')
+        client = api.app.test_client()
+
+        for url in ['/', '/cached', '/cached']:
+            resp = client.get(url)
+            self.assertIn('X-Response-Layout', resp.headers['Vary'])
+            self.assertEqual(json.loads(resp.data), [dict(id=1), dict(id=2)])
+
+        # the layouts chosen by header have different ETags
+        etag = client.get('/').headers['ETag']
+        resp = client.get('/', headers={'X-Response-Layout': 'table', 'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(json.loads(resp.data), dict(columns=['id'], rows=[[1], [2]]))
+        self.assertIn('X-Response-Layout', resp.headers['Vary'])
+        resp = client.get('/', headers={'X-Response-Layout': 'table', 'If-None-Match': resp.headers['ETag']})
+        self.assertEqual(resp.status_code, 304)
+
+    def test_response_cache(self):
+        for backend in [None, restful_extend.MappingBackend()]:
+            self.verify_response_cache(backend)
+
+    def verify_response_cache(self, backend):
+        testcase = self
+        testcase.calls = 0
+        api = Api(Flask(__name__))
+        restful_extend.enhance_json_encode(api)
+        cache = restful_extend.ResponseCache(api, backend=backend)
+
+        class Routes(Resource):
+            @cache.cached()
+            @marshal_with_model(testcase.TestModel, only=['id', 'col_str'])
+            def get(self):
+                testcase.calls += 1
+                return testcase.TestModel.query.order_by(testcase.TestModel.id)
+
+        api.add_resource(Routes, '/')
+        client = api.app.test_client()
+
+        expect = [dict(id=1, col_str='a'), dict(id=2, col_str='a')]
+        self.assertEqual(json.loads(client.get('/').data), expect)
+        self.assertEqual(json.loads(client.get('/').data), expect)
+        self.assertEqual(self.calls, 1)
+
+        # different query string is cached separately
+        client.get('/?page=2')
+        self.assertEqual(self.calls, 2)
+
+        # invalidated after the table was modified
+        self.TestModel.query.get(1).col_str = 'b'
+        self.db.session.commit()
+        expect[0]['col_str'] = 'b'
+        self.assertEqual(json.loads(client.get('/').data), expect)
+        self.assertEqual(self.calls, 3)
+
+        cache.invalidate(self.TestModel)
+        client.get('/')
+        self.assertEqual(self.calls, 4)
+
+        self.TestModel.query.get(1).col_str = 'a'
+        self.db.session.commit()
+
     def test_converter(self):
         register_model_converter(self.TestModel, self.app)
 
@@ -292,6 +720,106 @@ class MarshalTestCase(_ModelTestCase):
         api.add_resource(Routes, '/<TestModel:model>')
         self.client.get('/1')
 
+    def count_queries(self):
+        """Return a list, the executed SQL statements will be appended to it"""
+        statements = []
+        event.listen(self.db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+        return statements
+
+    def test_converter_cache(self):
+        cache = KeyedCache(maxsize=10)
+        register_model_converter(self.TestModel, self.app, cache=cache)
+
+        testcase = self
+        testcase.resolved = None
+
+        class Routes(Resource):
+            def get(self, model, model2):
+                testcase.resolved = (model, model2)
+                return model.col_str
+
+        api = Api(self.app)
+        api.add_resource(Routes, '/<TestModel:model>/<TestModel:model2>')
+
+        statements = self.count_queries()
+
+        # same instance in one request only query once
+        self.assertEqual(json.loads(self.client.get('/1/1').data), 'a')
+        self.assertIs(self.resolved[0], self.resolved[1])
+        self.assertEqual(len(statements), 1)
+
+        # cached across requests
+        self.assertEqual(json.loads(self.client.get('/1/1').data), 'a')
+        self.assertEqual(len(statements), 1)
+
+        # evicted after the instance was updated
+        instance = self.TestModel.query.get(1)
+        instance.col_str = 'b'
+        self.db.session.commit()
+        self.db.session.remove()
+        del statements[:]
+
+        self.assertEqual(json.loads(self.client.get('/1/1').data), 'b')
+        self.assertEqual(len(statements), 1)
+
+        self.assertEqual(self.client.get('/100/1').status_code, 404)
+
+        # the id is converted to the type of primary key, before it is used as the cache key
+        self.assertEqual(json.loads(self.client.get('/01/1').data), 'b')
+        instance = self.TestModel.query.get(1)
+        instance.col_str = 'c'
+        self.db.session.commit()
+        self.db.session.remove()
+        self.assertEqual(json.loads(self.client.get('/01/01').data), 'c')
+
+        restful_extend.invalidate_model_cache(self.TestModel, '01')
+        self.assertIsNone(cache.get((self.TestModel, 1)))
+
+    def test_converter_cache_shared_by_models(self):
+        class OtherModel(self.db.Model):
+            id = Column(Integer, primary_key=True)
+            name = Column(String(100))
+        OtherModel.__table__.create(self.db.engine)
+        self.db.session.add(OtherModel(id=1, name='other'))
+        self.db.session.commit()
+
+        cache = KeyedCache(maxsize=10)
+        register_model_converter(self.TestModel, self.app, cache=cache)
+        register_model_converter(OtherModel, self.app, cache=cache)
+
+        class TestModelRoutes(Resource):
+            def get(self, model):
+                return [type(model).__name__, model.id]
+
+        api = Api(self.app)
+        api.add_resource(TestModelRoutes, '/test/<TestModel:model>', '/other/<OtherModel:model>')
+
+        self.assertEqual(json.loads(self.client.get('/test/1').data), ['TestModel', 1])
+        self.assertEqual(json.loads(self.client.get('/other/1').data), ['OtherModel', 1])
+        self.assertEqual(json.loads(self.client.get('/test/1').data), ['TestModel', 1])
+
+        restful_extend.invalidate_model_cache(OtherModel)
+        self.assertIsNone(cache.get((OtherModel, 1)))
+        self.assertIsNotNone(cache.get((self.TestModel, 1)))
+
+    def test_deferred_converter(self):
+        register_model_converter(self.TestModel, self.app, defer=True)
+
+        class Routes(Resource):
+            def get(self, model, model2):
+                return [model.id, model2.id]
+
+        api = Api(self.app)
+        api.add_resource(Routes, '/<TestModel:model>/<TestModel:model2>')
+
+        statements = self.count_queries()
+        self.assertEqual(json.loads(self.client.get('/2/1').data), [2, 1])
+        self.assertEqual(len(statements), 1)
+
+        self.assertEqual(self.client.get('/1/100').status_code, 404)
+        self.assertEqual(self.client.get('/1/abc').status_code, 404)
+
 
 class ReqparseTestCase(_ModelTestCase):
     def __init__(self, *args, **kwargs):
@@ -513,3 +1041,62 @@ class ReqparseTestCase(_ModelTestCase):
                     getattr(entity, col.name),
                     data.get(col.name, None)
                 )
+
+    def test_populate_models(self):
+        data = [
+            {'col_int': 2, 'col_str': 'a', 'col_timestamp': '2013-12-21 14:19:05', 'col_float_null': 10.5},
+            {'col_int': 3},     # col_str and col_timestamp are required
+            'abc',
+            {'col_int': '4', 'col_str': 'b', 'col_timestamp': '2013-12-21 14:19:05'},
+        ]
+
+        with self.app.test_request_context(
+                method='POST',
+                data=json.dumps(data),
+                content_type="application/json"):
+            entities, errors = populate_models(self.TestModel)
+            self.assertEqual(sorted(errors.keys()), [1, 2])
+            self.assertEqual(len(entities), 2)
+            self.assertIsInstance(entities[0], self.TestModel)
+            self.assertEqual(entities[0].col_float_null, 10.5)
+            self.assertEqual(entities[1].col_int, 4)
+
+            mappings, errors = populate_models(self.TestModel, only=['col_int', 'col_str'], as_mappings=True)
+            self.assertEqual(sorted(errors.keys()), [1, 2])
+            self.assertEqual(mappings, [dict(col_int=2, col_str='a'), dict(col_int=4, col_str='b')])
+
+    def test_request_populator_json_fast_path(self):
+        def make_parser(fast_path):
+            parser = RequestPopulator()
+            parser.add_argument(name='foo', type=fixed_int)
+            parser.add_argument(name='bar')
+            parser.add_argument(name='li', type=int, action='append')
+            parser.add_argument(name='null_val', type=fixed_float)
+            parser.add_argument(name='empty_li', type=int)
+            parser.add_argument(name='xyz', type=int)
+            for arg in parser.args:
+                self.assertTrue(arg.json_fast_path)
+                arg.json_fast_path = fast_path
+            return parser
+
+        with self.app.test_request_context(
+                method='POST',
+                data='{"foo": "100", "bar": "abc", "li": [300, "100"], "null_val": null, "empty_li": []}',
+                content_type="application/json"):
+            expect = dict(foo=100, bar="abc", li=[300, 100], null_val=None)
+            self.assertEqual(make_parser(True).parse_args(), expect)
+            self.assertEqual(make_parser(False).parse_args(), expect)
+
+            for fast_path in [True, False]:
+                parser = make_parser(fast_path)
+                parser.add_argument(name='required_arg', required=True)
+                with self.assertRaises(HTTPException) as cm:
+                    parser.parse_args()
+                self.assertEqual(cm.exception.code, 400)
+
+        with self.app.test_request_context(
+                method='POST', data='{"foo": "abc"}', content_type="application/json"):
+            for fast_path in [True, False]:
+                with self.assertRaises(HTTPException) as cm:
+                    make_parser(fast_path).parse_args()
+                self.assertEqual(cm.exception.code, 400)
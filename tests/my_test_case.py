@@ -2,7 +2,7 @@
 import unittest
 from flask import Flask
 
-__all__ = ['MyTestCase']
+__all__ = ['MyTestCase', 'module_installed']
 
 
 class MyTestCase(unittest.TestCase):
@@ -11,4 +11,13 @@ class MyTestCase(unittest.TestCase):
         app.config['TESTING'] = True
 
         self.app = app
-        self.client = app.test_client()
\ No newline at end of file
+        self.client = app.test_client()
+
+
+def module_installed(name):
+    """Whether the optional library was installed, to skip the tests that require it."""
+    try:
+        __import__(name)
+        return True
+    except ImportError:
+        return False